@@ -0,0 +1,103 @@
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+
+from foodgram.cache import get_version
+from foodgram.constants import TOKEN_VERSION
+
+
+def get_token_version_name(key):
+    """Имя версии токена; сам ключ в общий кеш не попадает."""
+    return TOKEN_VERSION.format(hashlib.sha256(key.encode()).hexdigest())
+
+
+class TokenCache:
+    """Токены и их пользователи в памяти процесса.
+
+    Хранит не больше max_entries записей, вытесняя давно не читавшиеся,
+    и не дольше timeout секунд. Запись не выдаётся, если сменилась
+    версия токена: это происходит при его удалении и при любом
+    изменении пользователя, в том числе пароля и is_active.
+    """
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        hit = (
+            entry is not None
+            and entry['expires'] > time.monotonic()
+            and entry['version'] == get_version(entry['name'])
+        )
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+                if entry is not None and self._entries.get(key) is entry:
+                    del self._entries[key]
+        if not hit:
+            return None
+        return copy.copy(entry['user']), copy.copy(entry['token'])
+
+    def set(self, key, user, token, name, version):
+        entry = {
+            'name': name,
+            'version': version,
+            'expires': time.monotonic() + self.timeout,
+            'user': copy.copy(user),
+            'token': copy.copy(token),
+        }
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0,
+        }
+
+
+token_cache = TokenCache(
+    settings.TOKEN_CACHE_MAX_ENTRIES, settings.TOKEN_CACHE_TIMEOUT
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к базе для известных токенов."""
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is not None:
+            return cached
+        # Версия читается до запроса: изменение, случившееся между ними,
+        # сменит её, и прочитанные данные из кеша не будут выданы.
+        name = get_token_version_name(key)
+        version = get_version(name)
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, user, token, name, version)
+        return user, token
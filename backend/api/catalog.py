@@ -0,0 +1,92 @@
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.utils.functional import cached_property
+
+from foodgram.cache import VersionedStore
+from foodgram.constants import INGREDIENTS_CATALOG, TAGS_CATALOG
+from recipes.models import Ingredient, Tag
+
+from .search import IngredientIndex, TrigramIndex
+from .serializers import IngredientSerializer, TagSerializer
+
+
+class Catalog:
+    """Сериализованный справочник: список записей и индекс по id."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.by_id = {row['id']: row for row in rows}
+
+
+class IngredientCatalog(Catalog):
+    """Справочник ингредиентов с индексом для поиска по названию."""
+
+    def __init__(self, rows):
+        super().__init__(rows)
+        self.index = IngredientIndex(rows)
+
+    @cached_property
+    def trigram_index(self):
+        return TrigramIndex(
+            self.rows,
+            settings.INGREDIENT_FUZZY_THRESHOLD,
+            settings.INGREDIENT_FUZZY_MAX_POSTINGS,
+        )
+
+
+class TagCatalog(Catalog):
+    """Справочник тегов с битами масок по слагу."""
+
+    def __init__(self, rows, bits):
+        super().__init__(rows)
+        self.bits = bits
+
+    def get_mask(self, slugs):
+        mask = 0
+        for slug in slugs:
+            mask |= 1 << self.bits[slug]
+        return mask
+
+
+def load_tags():
+    tags = list(Tag.objects.all())
+    return TagCatalog(
+        TagSerializer(tags, many=True).data,
+        {tag.slug: tag.bit for tag in tags},
+    )
+
+
+def load_ingredients():
+    return IngredientCatalog(
+        IngredientSerializer(Ingredient.objects.all(), many=True).data
+    )
+
+
+tags_catalog = VersionedStore(TAGS_CATALOG, load_tags)
+ingredients_catalog = VersionedStore(INGREDIENTS_CATALOG, load_ingredients)
+
+
+def use_database_trigrams():
+    backend = settings.INGREDIENT_FUZZY_BACKEND
+    if backend == 'auto':
+        return connection.vendor == 'postgresql'
+    return backend == 'postgres'
+
+
+def fuzzy_search_ingredients(catalog, query, limit):
+    """Нечёткий поиск: pg_trgm в PostgreSQL, иначе индекс в памяти."""
+    if not use_database_trigrams():
+        return catalog.trigram_index.search(query, limit)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT set_limit(%s)', [settings.INGREDIENT_FUZZY_THRESHOLD]
+        )
+    queryset = (
+        Ingredient.objects.annotate(
+            similarity=TrigramSimilarity('name', query)
+        )
+        .filter(name__trigram_similar=query)
+        .order_by('-similarity', 'name')[:limit]
+    )
+    return IngredientSerializer(queryset, many=True).data
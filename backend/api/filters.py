@@ -1,7 +1,11 @@
 from django.contrib.auth import get_user_model
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Favourite, Ingredient, Recipe, ShoppingCart
+from recipes.services import filter_by_tags_mask
+
+from .catalog import tags_catalog
+from .utils import get_user_recipe_ids
 
 User = get_user_model()
 
@@ -14,17 +18,23 @@ class IngredientFilter(FilterSet):
         fields = ['name']
 
 
+def get_tag_choices():
+    _, catalog = tags_catalog.get()
+    return [(slug, slug) for slug in catalog.bits]
+
+
 class RecipeFilter(FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        field_name='tags__slug',
-        to_field_name='slug',
-        queryset=Tag.objects.all(),
+    tags = filters.MultipleChoiceFilter(
+        choices=get_tag_choices, method='filter_tags'
     )
 
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart'
     )
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'По популярности'),), method='order_queryset'
+    )
 
     class Meta:
         model = Recipe
@@ -33,14 +43,25 @@ class RecipeFilter(FilterSet):
             'author',
         )
 
+    def filter_tags(self, queryset, name, value):
+        _, catalog = tags_catalog.get()
+        return filter_by_tags_mask(queryset, catalog.get_mask(value))
+
     def filter_is_favorited(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(favorites__user=user)
+            return queryset.filter(id__in=get_user_recipe_ids(Favourite, user))
         return queryset
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         user = self.request.user
         if value and not user.is_anonymous:
-            return queryset.filter(shopping_cart__user=user)
+            return queryset.filter(
+                id__in=get_user_recipe_ids(ShoppingCart, user)
+            )
+        return queryset
+
+    def order_queryset(self, queryset, name, value):
+        if value == 'popular':
+            return queryset.order_by('-favorites_count', '-pub_date', '-id')
         return queryset
@@ -0,0 +1,101 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.catalog import (
+    fuzzy_search_ingredients,
+    ingredients_catalog,
+    use_database_trigrams,
+)
+from api.search import TrigramIndex
+
+LETTERS = 'абвгдеёжзийклмнопрстуфхцчшщъыьэюя'
+
+
+def make_typo(name, generator):
+    """Одна случайная опечатка: замена, пропуск или перестановка букв."""
+    letters = list(name)
+    position = generator.randrange(len(letters) - 1)
+    kind = generator.choice(('replace', 'delete', 'swap'))
+    if kind == 'replace':
+        letters[position] = generator.choice(LETTERS)
+    elif kind == 'delete':
+        del letters[position]
+    else:
+        letters[position], letters[position + 1] = (
+            letters[position + 1],
+            letters[position],
+        )
+    return ''.join(letters)
+
+
+class Command(BaseCommand):
+    help = 'Полнота и задержка нечёткого поиска ингредиентов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size',
+            type=int,
+            default=100_000,
+            help='Размер синтетического справочника для индекса в памяти',
+        )
+        parser.add_argument('--queries', type=int, default=500)
+
+    def report(self, title, search, cases):
+        timings = []
+        found = 0
+        for typo, name in cases:
+            started = time.perf_counter()
+            rows = search(typo)
+            timings.append((time.perf_counter() - started) * 1000)
+            found += any(row['name'] == name for row in rows)
+        timings.sort()
+        self.stdout.write(
+            f'{title}: полнота {found / len(cases):.1%}, '
+            f'p50 {timings[len(timings) // 2]:.2f} мс, '
+            f'p95 {timings[int(len(timings) * 0.95)]:.2f} мс, '
+            f'max {timings[-1]:.2f} мс'
+        )
+
+    def handle(self, *args, **options):
+        _, catalog = ingredients_catalog.get()
+        rows = [row for row in catalog.rows if len(row['name']) > 3]
+        if not rows:
+            self.stderr.write('Справочник ингредиентов пуст')
+            return
+        generator = random.Random(0)
+        cases = [
+            (make_typo(row['name'], generator), row['name'])
+            for row in generator.choices(rows, k=options['queries'])
+        ]
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+
+        synthetic = list(catalog.rows)
+        while len(synthetic) < options['size']:
+            row = generator.choice(catalog.rows)
+            synthetic.append(
+                {
+                    'id': len(synthetic),
+                    'name': f'{row["name"]} {generator.choice(rows)["name"]}',
+                    'measurement_unit': row['measurement_unit'],
+                }
+            )
+        started = time.perf_counter()
+        index = TrigramIndex(
+            synthetic,
+            settings.INGREDIENT_FUZZY_THRESHOLD,
+            settings.INGREDIENT_FUZZY_MAX_POSTINGS,
+        )
+        self.stdout.write(
+            f'Индекс на {len(synthetic)} записей построен за '
+            f'{time.perf_counter() - started:.2f} с'
+        )
+        self.report('память', lambda query: index.search(query, limit), cases)
+        if use_database_trigrams():
+            self.report(
+                'pg_trgm',
+                lambda query: fuzzy_search_ingredients(catalog, query, limit),
+                cases,
+            )
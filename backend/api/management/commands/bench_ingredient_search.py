@@ -0,0 +1,76 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.catalog import ingredients_catalog
+from api.filters import IngredientFilter
+from api.serializers import IngredientSerializer
+from recipes.models import Ingredient
+
+
+def measure(search, queries, repeat):
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            started = time.perf_counter()
+            search(query)
+            timings.append((time.perf_counter() - started) * 1_000_000)
+    timings.sort()
+    return statistics.mean(timings), timings[int(len(timings) * 0.95)]
+
+
+class Command(BaseCommand):
+    help = 'Сравнение поиска ингредиентов через ORM и индекс в памяти'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        _, catalog = ingredients_catalog.get()
+        if not catalog.rows:
+            self.stderr.write('Справочник ингредиентов пуст')
+            return
+        generator = random.Random(0)
+        names = [
+            row['name']
+            for row in generator.choices(catalog.rows, k=options['queries'])
+        ]
+        alphabet = sorted(set(''.join(row['name'] for row in catalog.rows)))
+        kinds = {
+            'prefix': [name[: generator.randint(1, 4)] for name in names],
+            'substring': [
+                name[1:][: generator.randint(2, 4)] or name for name in names
+            ],
+            'miss': [''.join(generator.choices(alphabet, k=6)) for _ in names],
+        }
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+
+        def orm_search(query):
+            queryset = IngredientFilter(
+                {'name': query}, queryset=Ingredient.objects.all()
+            ).qs
+            return IngredientSerializer(queryset, many=True).data
+
+        def index_search(query):
+            return catalog.index.search(query, limit)
+
+        self.stdout.write(
+            f'Ингредиентов: {len(catalog.rows)}, '
+            f'запросов: {options["queries"]} x {options["repeat"]}'
+        )
+        # Списки троек индекса строятся при первом поиске по вхождению.
+        catalog.index.search('индекс', limit)
+        for kind, queries in kinds.items():
+            for title, search in (
+                ('ORM', orm_search),
+                ('index', index_search),
+            ):
+                mean, p95 = measure(search, queries, options['repeat'])
+                self.stdout.write(
+                    f'{kind:>9} {title:>6}: среднее {mean:10.1f} мкс, '
+                    f'p95 {p95:10.1f} мкс'
+                )
@@ -0,0 +1,141 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.serializers import RecipeWriteSerializer
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from users.models import User
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE')
+SAVEPOINT_STATEMENTS = ('SAVEPOINT', 'RELEASE', 'ROLLBACK')
+
+
+def legacy_update(recipe, data):
+    """Обновление очисткой и повторной вставкой всех связей."""
+    recipe.tags.clear()
+    recipe.tags.set(data['tags'])
+    recipe.ingredients.clear()
+    IngredientInRecipe.objects.bulk_create(
+        IngredientInRecipe(
+            recipe=recipe, ingredient_id=item['id'], amount=item['amount']
+        )
+        for item in data['ingredients']
+    )
+    for field in ('name', 'text', 'cooking_time'):
+        setattr(recipe, field, data[field])
+    recipe.save()
+
+
+def diff_update(recipe, data):
+    serializer = RecipeWriteSerializer(
+        recipe, data=data, partial=True, context={'request': None}
+    )
+    serializer.is_valid(raise_exception=True)
+    serializer.save()
+
+
+class WriteCounter:
+    """Обёртка запросов, считающая запросы и затронутые записью строки.
+
+    Точки сохранения вложенных транзакций не учитываются.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.writes = 0
+        self.rows = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        statement = sql.lstrip().upper()
+        if statement.startswith(SAVEPOINT_STATEMENTS):
+            return result
+        self.queries += 1
+        if statement.startswith(WRITE_STATEMENTS):
+            self.writes += 1
+            self.rows += max(context['cursor'].rowcount, 0)
+        return result
+
+
+def measure(update, recipe, payloads):
+    counter = WriteCounter()
+    started = time.perf_counter()
+    with connection.execute_wrapper(counter):
+        for payload in payloads:
+            update(recipe, payload)
+    return counter, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = 'Сравнение объёма записи при обновлении рецепта'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ingredients', type=int, default=30)
+        parser.add_argument('--updates', type=int, default=50)
+
+    def handle(self, *args, **options):
+        size = options['ingredients']
+        with transaction.atomic():
+            author = User.objects.create(
+                username='bench-update', email='bench-update@example.com'
+            )
+            tags = [
+                Tag.objects.create(
+                    name=f'bench-{number}',
+                    color=f'#00000{number}',
+                    slug=f'bench-{number}',
+                )
+                for number in range(3)
+            ]
+            Ingredient.objects.bulk_create(
+                Ingredient(name=f'bench-{number}', measurement_unit='г')
+                for number in range(size)
+            )
+            ingredients = list(
+                Ingredient.objects.filter(name__startswith='bench-')
+            )
+            scenarios = {
+                'текст': lambda number: {},
+                'одно количество': lambda number: {
+                    ingredients[0].pk: 1 + number % 2
+                },
+            }
+            for title, changes in scenarios.items():
+                payloads = [
+                    {
+                        'tags': [tag.pk for tag in tags],
+                        'ingredients': [
+                            {
+                                'id': ingredient.pk,
+                                'amount': changes(number).get(
+                                    ingredient.pk, 1
+                                ),
+                            }
+                            for ingredient in ingredients
+                        ],
+                        'name': 'bench',
+                        'text': f'bench {number}',
+                        'cooking_time': 10,
+                    }
+                    for number in range(options['updates'])
+                ]
+                self.stdout.write(
+                    f'{title}: {size} ингредиентов, '
+                    f'{options["updates"]} обновлений'
+                )
+                for name, update in (
+                    ('legacy', legacy_update),
+                    ('diff', diff_update),
+                ):
+                    recipe = Recipe.objects.create(
+                        author=author, name='bench', text='', cooking_time=10
+                    )
+                    legacy_update(recipe, payloads[-1])
+                    counter, elapsed = measure(update, recipe, payloads)
+                    self.stdout.write(
+                        f'{name:>8}: запросов {counter.queries}, '
+                        f'запросов записи {counter.writes}, '
+                        f'записано строк {counter.rows}, {elapsed:.2f} с'
+                    )
+            transaction.set_rollback(True)
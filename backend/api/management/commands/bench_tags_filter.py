@@ -0,0 +1,114 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import Recipe, Tag
+from recipes.services import filter_by_tags_mask
+from users.models import User
+
+
+def measure(search, queries, repeat):
+    timings = []
+    for _ in range(repeat):
+        for query in queries:
+            started = time.perf_counter()
+            search(query)
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.mean(timings), timings[int(len(timings) * 0.95)]
+
+
+class Command(BaseCommand):
+    help = 'Сравнение фильтра рецептов по тегам через JOIN и через маску'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=20000)
+        parser.add_argument('--tags', type=int, default=8)
+        parser.add_argument('--queries', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=6)
+
+    def handle(self, *args, **options):
+        generator = random.Random(0)
+        with transaction.atomic():
+            author = User.objects.create(
+                username='bench-tags', email='bench-tags@example.com'
+            )
+            tags = [
+                Tag.objects.create(
+                    name=f'bench-{number}',
+                    color=f'#{number:06x}',
+                    slug=f'bench-{number}',
+                )
+                for number in range(options['tags'])
+            ]
+            Recipe.objects.bulk_create(
+                Recipe(
+                    author=author,
+                    name=f'bench-{number}',
+                    image='recipes/bench.png',
+                    text='',
+                    cooking_time=10,
+                )
+                for number in range(options['recipes'])
+            )
+            recipes = list(
+                Recipe.objects.filter(author=author).values_list(
+                    'id', flat=True
+                )
+            )
+            links, masks = [], []
+            for recipe_id in recipes:
+                mask = 0
+                for tag in generator.sample(tags, generator.randint(1, 3)):
+                    links.append(
+                        Recipe.tags.through(recipe_id=recipe_id, tag=tag)
+                    )
+                    mask |= 1 << tag.bit
+                masks.append(Recipe(id=recipe_id, tags_mask=mask))
+            Recipe.tags.through.objects.bulk_create(links, batch_size=5000)
+            Recipe.objects.bulk_update(masks, ['tags_mask'], batch_size=5000)
+            queries = [
+                generator.sample(tags, generator.randint(1, 3))
+                for _ in range(options['queries'])
+            ]
+            page_size = options['page_size']
+            base = Recipe.objects.filter(author=author)
+
+            def join_filter(query):
+                queryset = base.filter(
+                    tags__slug__in=[tag.slug for tag in query]
+                ).distinct()
+                return queryset.count(), list(
+                    queryset.order_by('-pub_date', '-id')[:page_size]
+                )
+
+            def mask_filter(query):
+                mask = 0
+                for tag in query:
+                    mask |= 1 << tag.bit
+                queryset = filter_by_tags_mask(base, mask)
+                return queryset.count(), list(
+                    queryset.order_by('-pub_date', '-id')[:page_size]
+                )
+
+            for query in queries:
+                join, mask = join_filter(query), mask_filter(query)
+                if join[0] != mask[0]:
+                    raise AssertionError('Фильтры вернули разное число строк')
+            self.stdout.write(
+                f'Рецептов: {len(recipes)}, тегов: {len(tags)}, '
+                f'запросов: {len(queries)} x {options["repeat"]}'
+            )
+            for title, search in (
+                ('JOIN', join_filter),
+                ('mask', mask_filter),
+            ):
+                mean, p95 = measure(search, queries, options['repeat'])
+                self.stdout.write(
+                    f'{title:>6}: среднее {mean:8.2f} мс, p95 {p95:8.2f} мс'
+                )
+            transaction.set_rollback(True)
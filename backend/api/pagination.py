@@ -1,7 +1,49 @@
 from django.conf import settings
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class CustomPagination(PageNumberPagination):
-    page_size_query_param = "limit"
+    """Постраничная пагинация с включаемым режимом курсора.
+
+    Если в запросе передан параметр cursor (даже пустой), страница
+    выбирается по ключу cursor_ordering без COUNT и OFFSET.
+    """
+
+    page_size_query_param = 'limit'
     page_size = settings.DRF_PAGE_SIZE
+    cursor_query_param = 'cursor'
+    cursor_ordering = ('id',)
+
+    def __init__(self):
+        self.cursor_paginator = None
+
+    def get_cursor_paginator(self):
+        paginator = CursorPagination()
+        paginator.cursor_query_param = self.cursor_query_param
+        paginator.ordering = self.cursor_ordering
+        paginator.page_size = self.page_size
+        paginator.page_size_query_param = self.page_size_query_param
+        paginator.max_page_size = self.max_page_size
+        return paginator
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            self.cursor_paginator = self.get_cursor_paginator()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
+
+
+class RecipePagination(CustomPagination):
+    cursor_ordering = ('-pub_date', '-id')
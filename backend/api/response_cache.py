@@ -0,0 +1,101 @@
+import hashlib
+import threading
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+
+from foodgram.cache import get_versions
+from foodgram.constants import (
+    AUTHOR_VERSION,
+    INGREDIENT_VERSION,
+    RECIPE_VERSION,
+    TAG_VERSION,
+)
+
+RESPONSE_KEY = 'response:{}'
+
+
+def recipe_dependencies(recipe):
+    """Наборы данных, из которых собрано представление рецепта."""
+    yield RECIPE_VERSION.format(recipe['id'])
+    yield AUTHOR_VERSION.format(recipe['author']['id'])
+    for tag in recipe['tags']:
+        yield TAG_VERSION.format(tag['id'])
+    for ingredient in recipe['ingredients']:
+        yield INGREDIENT_VERSION.format(ingredient['id'])
+
+
+class ResponseCache:
+    """Общий кеш ответов для анонимных пользователей.
+
+    Вместе с данными ответа запись хранит версии наборов данных, от
+    которых он зависит, и не выдаётся, если хотя бы одна из них
+    сменилась. Вытеснение давно не читавшихся записей остаётся за
+    бэкендом кеша (LocMemCache вытесняет по LRU).
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def make_key(self, request):
+        """Ключ по хосту, пути и параметрам в каноническом порядке."""
+        query = urlencode(
+            sorted(
+                (key, value)
+                for key, values in request.query_params.lists()
+                for value in values
+            )
+        )
+        url = f'{request.get_host()}{request.path}?{query}'
+        return RESPONSE_KEY.format(hashlib.md5(url.encode()).hexdigest())
+
+    def count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        entry = self.cache.get(key)
+        hit = entry is not None and (
+            get_versions(entry['versions']) == entry['versions']
+        )
+        self.count(hit)
+        return entry['data'] if hit else None
+
+    def set(self, key, data, dependencies, known_versions=None):
+        """Сохранить ответ вместе с версиями его зависимостей.
+
+        known_versions — версии, прочитанные до построения ответа. Если
+        какая-то из них с тех пор сменилась, ответ не сохраняется.
+        Возвращает признак сохранения.
+        """
+        known_versions = known_versions or {}
+        versions = get_versions(set(dependencies) | set(known_versions))
+        if any(
+            versions[name] != version
+            for name, version in known_versions.items()
+        ):
+            return False
+        self.cache.set(key, {'versions': versions, 'data': data})
+        return True
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0,
+        }
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE)
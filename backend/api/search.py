@@ -0,0 +1,164 @@
+import heapq
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+from django.utils.functional import cached_property
+
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Привести строку к виду для сравнения без учёта регистра и «ё»."""
+    return text.casefold().replace('ё', 'е').strip()
+
+
+def trigrams(text):
+    """Множество триграмм строки по правилам pg_trgm."""
+    grams = set()
+    for word in WORD_RE.findall(normalize(text)):
+        padded = f'  {word} '
+        grams.update(map(''.join, zip(padded, padded[1:], padded[2:])))
+    return grams
+
+
+def substrings(text):
+    """Все тройки подряд идущих символов строки."""
+    return map(''.join, zip(text, text[1:], text[2:]))
+
+
+class IngredientIndex:
+    """Индекс названий ингредиентов в памяти процесса.
+
+    Совпадения по началу названия ищутся двоичным поиском по
+    отсортированным ключам, за ними следуют совпадения по вхождению.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.names = [normalize(row['name']) for row in rows]
+        order = sorted(range(len(rows)), key=self.names.__getitem__)
+        self.keys = [self.names[position] for position in order]
+        self.order = order
+        self.text = '\n'.join(self.names)
+        self.starts = array('I')
+        start = 0
+        for name in self.names:
+            self.starts.append(start)
+            start += len(name) + 1
+
+    @cached_property
+    def postings(self):
+        """Номера названий по каждой входящей в них тройке символов."""
+        postings = {}
+        for position, name in enumerate(self.names):
+            for gram in set(substrings(name)):
+                postings.setdefault(gram, []).append(position)
+        return {gram: array('I', found) for gram, found in postings.items()}
+
+    @cached_property
+    def short_grams(self):
+        """Все одно- и двухсимвольные подстроки названий."""
+        grams = set()
+        for gram in self.postings:
+            grams.update((gram[0], gram[:2], gram[1:], gram[2]))
+        for name in self.names:
+            if len(name) < 3:
+                grams.update(name)
+                grams.add(name)
+        return grams
+
+    def find_substrings(self, query):
+        """Номера названий, содержащих query, в порядке справочника.
+
+        Для запросов от трёх символов кандидаты берутся из самого
+        короткого списка троек, для более коротких — поиском по общей
+        строке названий, если такая подстрока вообще встречается.
+        Промахи поэтому не требуют просмотра всех названий.
+        """
+        if '\n' in query:
+            return
+        if len(query) >= 3:
+            candidates = min(
+                (self.postings.get(gram, ()) for gram in substrings(query)),
+                key=len,
+            )
+            for position in candidates:
+                if query in self.names[position]:
+                    yield position
+            return
+        if query not in self.short_grams:
+            return
+        start = 0
+        while True:
+            start = self.text.find(query, start)
+            if start < 0:
+                return
+            position = bisect_right(self.starts, start) - 1
+            yield position
+            start = self.starts[position] + len(self.names[position]) + 1
+
+    def search(self, query, limit):
+        query = normalize(query)
+        if not query:
+            return []
+        found = []
+        start = bisect_left(self.keys, query)
+        end = start + limit
+        for key, position in zip(self.keys[start:end], self.order[start:end]):
+            if not key.startswith(query):
+                break
+            found.append(position)
+        if len(found) < limit:
+            for position in self.find_substrings(query):
+                if not self.names[position].startswith(query):
+                    found.append(position)
+                    if len(found) == limit:
+                        break
+        return [self.rows[position] for position in found]
+
+
+class TrigramIndex:
+    """Инвертированный индекс триграмм для нечёткого поиска.
+
+    Списки вхождений просматриваются от редких триграмм к частым, пока не
+    исчерпан бюджет max_postings, поэтому время запроса ограничено при
+    любом размере справочника.
+    """
+
+    def __init__(self, rows, threshold, max_postings):
+        self.rows = rows
+        self.threshold = threshold
+        self.max_postings = max_postings
+        self.sizes = array('H')
+        postings = {}
+        for position, row in enumerate(rows):
+            grams = trigrams(row['name'])
+            self.sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, array('I')).append(position)
+        self.postings = postings
+
+    def search(self, query, limit):
+        grams = trigrams(query)
+        if not grams:
+            return []
+        shared = Counter()
+        budget = self.max_postings
+        for posting in sorted(
+            (self.postings.get(gram, ()) for gram in grams), key=len
+        ):
+            if len(posting) > budget:
+                break
+            shared.update(posting)
+            budget -= len(posting)
+        scored = []
+        for position, count in shared.items():
+            similarity = count / (len(grams) + self.sizes[position] - count)
+            if similarity >= self.threshold:
+                scored.append((-similarity, position))
+        return [
+            self.rows[position]
+            for _, position in heapq.nsmallest(limit, scored)
+        ]
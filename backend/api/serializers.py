@@ -1,12 +1,14 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.files.storage import default_storage
 from django.db import transaction
-from django.db.models import F
+from django.db.models import prefetch_related_objects
 from djoser.serializers import UserSerializer
-from drf_extra_fields.fields import Base64ImageField
+from drf_extra_fields.fields import Base64ImageField, HybridImageField
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
-from rest_framework.relations import PrimaryKeyRelatedField
 from rest_framework.serializers import ModelSerializer
 from rest_framework.validators import UniqueTogetherValidator
 
@@ -18,9 +20,21 @@ from recipes.models import (
     ShoppingCart,
     Tag,
 )
-from users.constants import LIMIT_RECIPE
+from recipes.services import update_recipe_ingredients
 from users.models import Subscription
 
+from .uploads import get_image_too_large_message
+from .utils import (
+    get_image_variants,
+    get_ingredients_prefetch,
+    get_objects_in_bulk,
+    get_recipes_limit,
+    get_subscribed_authors,
+    get_subscription_authors,
+    get_user_recipe_ids,
+    set_prefetched,
+)
+
 User = get_user_model()
 
 
@@ -41,6 +55,9 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        subscribed_authors = self.context.get('subscribed_authors')
+        if subscribed_authors is not None:
+            return obj.id in subscribed_authors
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
@@ -61,13 +78,58 @@ class TagSerializer(ModelSerializer):
         fields = ('id', 'name', 'color', 'slug')
 
 
-class RecipeReadSerializer(ModelSerializer):
+class IngredientInRecipeReadSerializer(ModelSerializer):
+    """Сериализатор ингредиента в составе рецепта."""
+
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        model = IngredientInRecipe
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
+class RecipeImageMixin(serializers.Serializer):
+    """Миниатюра и srcset из уменьшенных копий изображения рецепта.
+
+    Пока копии не построены, миниатюрой служит исходное изображение.
+    """
+
+    image_thumb = SerializerMethodField(read_only=True)
+    image_srcset = SerializerMethodField(read_only=True)
+
+    def get_file_url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_image_thumb(self, obj):
+        variants = get_image_variants(obj, settings.IMAGE_SRCSET_FORMAT)
+        if variants:
+            return self.get_file_url(variants[0]['name'])
+        return self.get_file_url(obj.image.name) if obj.image else None
+
+    def get_image_srcset(self, obj):
+        return ', '.join(
+            f'{self.get_file_url(variant["name"])} {variant["width"]}w'
+            for variant in get_image_variants(
+                obj, settings.IMAGE_SRCSET_FORMAT
+            )
+        )
+
+
+class RecipeReadSerializer(RecipeImageMixin, ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
     author = CustomUserSerializer(read_only=True)
-    ingredients = SerializerMethodField()
+    ingredients = IngredientInRecipeReadSerializer(
+        source='ingredient_list', many=True, read_only=True
+    )
     image = Base64ImageField()
-    is_favorited = serializers.BooleanField(read_only=True)
-    is_in_shopping_cart = serializers.BooleanField(read_only=True)
+    is_favorited = SerializerMethodField(read_only=True)
+    is_in_shopping_cart = SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
@@ -78,6 +140,8 @@ class RecipeReadSerializer(ModelSerializer):
             'ingredients',
             'name',
             'image',
+            'image_thumb',
+            'image_srcset',
             'text',
             'pub_date',
             'cooking_time',
@@ -85,29 +149,58 @@ class RecipeReadSerializer(ModelSerializer):
             'is_in_shopping_cart',
         )
 
-    def get_ingredients(self, obj):
-        ingredients = obj.ingredients.values(
-            'id',
-            'name',
-            'measurement_unit',
-            amount=F('ingredient_list__amount'),
-        )
-        return ingredients
+    def get_user_recipes(self, model):
+        """Id рецептов пользователя, один раз на весь ответ."""
+        key = f'user_recipes_{model._meta.model_name}'
+        if key not in self.context:
+            request = self.context.get('request')
+            self.context[key] = get_user_recipe_ids(
+                model, request.user if request else AnonymousUser()
+            )
+        return self.context[key]
+
+    def get_is_favorited(self, obj):
+        return obj.id in self.get_user_recipes(Favourite)
+
+    def get_is_in_shopping_cart(self, obj):
+        return obj.id in self.get_user_recipes(ShoppingCart)
 
 
 class IngredientInRecipeWriteSerializer(ModelSerializer):
-    id = PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
+    """Ингредиент в рецепте при записи.
+
+    Id здесь только проверяется как число, а сами ингредиенты
+    загружаются в RecipeWriteSerializer одним запросом на весь рецепт.
+    """
+
+    id = serializers.IntegerField(min_value=1)
 
     class Meta:
         model = IngredientInRecipe
         fields = ('id', 'amount')
 
 
+class RecipeImageField(HybridImageField):
+    """Изображение base64-строкой в JSON или файлом в multipart.
+
+    Размер проверяется до декодирования строки и открытия файла.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            size = len(data.partition(';base64,')[2] or data) * 3 // 4
+        else:
+            size = getattr(data, 'size', 0)
+        if size > settings.RECIPE_IMAGE_MAX_SIZE:
+            raise ValidationError(get_image_too_large_message())
+        return super().to_internal_value(data)
+
+
 class RecipeWriteSerializer(ModelSerializer):
-    tags = PrimaryKeyRelatedField(queryset=Tag.objects.all(), many=True)
+    tags = serializers.ListField(child=serializers.IntegerField(min_value=1))
     author = CustomUserSerializer(read_only=True)
     ingredients = IngredientInRecipeWriteSerializer(many=True)
-    image = Base64ImageField()
+    image = RecipeImageField()
 
     class Meta:
         model = Recipe
@@ -129,18 +222,22 @@ class RecipeWriteSerializer(ModelSerializer):
             raise ValidationError(
                 {'ingredients': 'Нужен хотя бы один ингредиент!'}
             )
-        ingredients_list = []
-        for item in ingredients:
-            if item in ingredients_list:
-                raise ValidationError(
-                    {'ingredients': 'Ингридиенты не могут повторяться!'}
-                )
-            if int(item['amount']) <= 0:
-                raise ValidationError(
-                    {'amount': 'Количество ингредиента должно быть больше 0!'}
-                )
-            ingredients_list.append(item)
-        return value
+        ids = [item['id'] for item in ingredients]
+        if len(ids) != len(set(ids)):
+            raise ValidationError(
+                {'ingredients': 'Ингридиенты не могут повторяться!'}
+            )
+        if any(int(item['amount']) <= 0 for item in ingredients):
+            raise ValidationError(
+                {'amount': 'Количество ингредиента должно быть больше 0!'}
+            )
+        objects = get_objects_in_bulk(
+            Ingredient.objects.all(), ids, 'ingredients', 'Нет ингредиентов'
+        )
+        return [
+            {**item, 'id': ingredient}
+            for item, ingredient in zip(ingredients, objects)
+        ]
 
     def validate_tags(self, value):
         tags = value
@@ -148,18 +245,21 @@ class RecipeWriteSerializer(ModelSerializer):
             raise ValidationError({'tags': 'Нужно выбрать хотя бы один тег!'})
         if len(tags) != len(set(tags)):
             raise ValidationError({'tags': 'Теги должны быть уникальными!'})
-
-        return value
+        return get_objects_in_bulk(
+            Tag.objects.all(), tags, 'tags', 'Нет тегов'
+        )
 
     @transaction.atomic
     def create_ingredients_amounts(self, ingredients, recipe):
-        IngredientInRecipe.objects.bulk_create(
-            IngredientInRecipe(
-                ingredient=ingredient['id'],
-                recipe=recipe,
-                amount=ingredient['amount'],
-            )
-            for ingredient in ingredients
+        return IngredientInRecipe.objects.bulk_create(
+            [
+                IngredientInRecipe(
+                    ingredient=ingredient['id'],
+                    recipe=recipe,
+                    amount=ingredient['amount'],
+                )
+                for ingredient in ingredients
+            ]
         )
 
     @transaction.atomic
@@ -167,30 +267,95 @@ class RecipeWriteSerializer(ModelSerializer):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
         recipe = Recipe.objects.create(**validated_data)
-        recipe.tags.set(tags)
-        self.create_ingredients_amounts(recipe=recipe, ingredients=ingredients)
+        recipe.tags.add(*tags)
+        self.prefetched = {
+            'tags': tags,
+            'ingredient_list': self.create_ingredients_amounts(
+                recipe=recipe, ingredients=ingredients
+            ),
+        }
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('ingredients')
-
-        instance.tags.clear()
-        instance.tags.set(tags)
-        instance.ingredients.clear()
-        self.create_ingredients_amounts(
-            recipe=instance, ingredients=ingredients
-        )
-        return super().update(instance, validated_data)
+        """Частичное обновление рецепта.
+
+        Теги и ингредиенты меняются только при их наличии в запросе и
+        только в отличающейся части, а в UPDATE попадают лишь изменённые
+        поля рецепта. Любое изменение обновляет updated_at.
+        """
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('ingredients', None)
+        self.prefetched = {
+            name: list(queryset)
+            for name, queryset in getattr(
+                instance, '_prefetched_objects_cache', {}
+            ).items()
+        }
+        touched = False
+        if tags is not None:
+            current_tags = self.prefetched.get('tags')
+            if current_tags is None:
+                current_tags = instance.tags.all()
+            if {tag.id for tag in tags} != {tag.id for tag in current_tags}:
+                instance.tags.set(tags)
+                touched = True
+            self.prefetched['tags'] = tags
+        if ingredients is not None:
+            objects = {item['id'].id: item['id'] for item in ingredients}
+            items, ingredients_changed = update_recipe_ingredients(
+                instance,
+                {item['id'].id: item['amount'] for item in ingredients},
+                self.prefetched.get('ingredient_list'),
+            )
+            for item in items:
+                item.ingredient = objects[item.ingredient_id]
+            self.prefetched['ingredient_list'] = items
+            touched = touched or ingredients_changed
+        changed = [
+            field
+            for field, value in validated_data.items()
+            if getattr(instance, field) != value
+        ]
+        for field in changed:
+            setattr(instance, field, validated_data[field])
+        if changed or touched:
+            instance.save(update_fields=changed + ['updated_at'])
+        return instance
 
     def to_representation(self, instance):
+        """Ответ из уже известных данных без повторной загрузки рецепта.
+
+        Теги и состав берутся из данных запроса, личные флаги из
+        закешированных наборов id рецептов пользователя.
+        """
+        prefetched = getattr(self, 'prefetched', {})
+        if 'tags' in prefetched:
+            prefetched['tags'] = sorted(
+                prefetched['tags'], key=lambda tag: tag.id
+            )
+        if 'ingredient_list' in prefetched:
+            prefetched['ingredient_list'] = sorted(
+                prefetched['ingredient_list'],
+                key=lambda item: item.ingredient.name,
+            )
+        for name, objects in prefetched.items():
+            set_prefetched(instance, name, objects)
+        prefetch_related_objects(
+            [instance], 'tags', get_ingredients_prefetch()
+        )
         request = self.context.get('request')
-        context = {'request': request}
+        user = request.user if request else AnonymousUser()
+        context = {
+            'request': request,
+            'subscribed_authors': get_subscribed_authors(
+                user, [instance.author_id]
+            ),
+        }
         return RecipeReadSerializer(instance, context=context).data
 
 
-class RecipeShortSerializer(ModelSerializer):
+class RecipeShortSerializer(RecipeImageMixin, ModelSerializer):
     image = Base64ImageField()
 
     class Meta:
@@ -199,6 +364,8 @@ class RecipeShortSerializer(ModelSerializer):
             'id',
             'name',
             'image',
+            'image_thumb',
+            'image_srcset',
             'cooking_time',
             'pub_date',
         )
@@ -207,6 +374,19 @@ class RecipeShortSerializer(ModelSerializer):
         return Recipe.objects.create(**validated_data)
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для пакетных операций."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPES_BULK_LIMIT,
+    )
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
+
+
 class ShowFavoriteSerializer(ModelSerializer):
     """Сериализатор для отображения избранного."""
 
@@ -243,19 +423,17 @@ class ShowSubscriptionsSerializer(CustomUserSerializer):
 
     def get_recipes(self, object):
         """Метод получение рецепта."""
-        try:
-            limit = int(
-                self.context['request'].query_params.get(
-                    'recipes_limit', default=0
-                )
-            )
-        except ValueError:
-            raise ValueError(LIMIT_RECIPE)
-        author_recipes = object.recipes.all()[:limit]
+        author_recipes = getattr(object, 'latest_recipes', None)
+        if author_recipes is None:
+            limit = get_recipes_limit(self.context['request'])
+            author_recipes = object.recipes.all()[:limit]
         return RecipeShortSerializer(author_recipes, many=True).data
 
     def get_recipes_count(self, object):
-        return object.recipes.count()
+        recipes_count = getattr(object, 'recipes_count', None)
+        if recipes_count is None:
+            return object.recipes.count()
+        return recipes_count
 
 
 class SubscriptionSerializer(ModelSerializer):
@@ -272,8 +450,17 @@ class SubscriptionSerializer(ModelSerializer):
         ]
 
     def to_representation(self, instance):
+        request = self.context.get('request')
+        author = get_subscription_authors(
+            User.objects.filter(id=instance.author_id),
+            self.context['recipes_limit'],
+        ).get()
         return ShowSubscriptionsSerializer(
-            instance.author, context={'request': self.context.get('request')}
+            author,
+            context={
+                'request': request,
+                'subscribed_authors': {instance.author_id},
+            },
         ).data
 
 
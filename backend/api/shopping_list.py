@@ -0,0 +1,240 @@
+import csv
+import json
+
+from django.core.cache import cache
+
+from foodgram.cache import get_version
+from foodgram.constants import CART_VERSION, INGREDIENTS_CATALOG
+from recipes.models import ShoppingCartIngredient
+
+SHOPPING_LIST_KEY = 'shopping-list:{}:{}:{}'
+
+# fmt: off
+TRANSLITERATION = str.maketrans(
+    {
+        'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e',
+        'ё': 'e', 'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y', 'к': 'k',
+        'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r',
+        'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'kh', 'ц': 'ts',
+        'ч': 'ch', 'ш': 'sh', 'щ': 'shch', 'ъ': '', 'ы': 'y', 'ь': '',
+        'э': 'e', 'ю': 'yu', 'я': 'ya',
+        'А': 'A', 'Б': 'B', 'В': 'V', 'Г': 'G', 'Д': 'D', 'Е': 'E',
+        'Ё': 'E', 'Ж': 'Zh', 'З': 'Z', 'И': 'I', 'Й': 'Y', 'К': 'K',
+        'Л': 'L', 'М': 'M', 'Н': 'N', 'О': 'O', 'П': 'P', 'Р': 'R',
+        'С': 'S', 'Т': 'T', 'У': 'U', 'Ф': 'F', 'Х': 'Kh', 'Ц': 'Ts',
+        'Ч': 'Ch', 'Ш': 'Sh', 'Щ': 'Shch', 'Ъ': '', 'Ы': 'Y', 'Ь': '',
+        'Э': 'E', 'Ю': 'Yu', 'Я': 'Ya',
+    }
+)
+# fmt: on
+
+
+def get_shopping_list(user):
+    """Суммарные количества ингредиентов из корзины пользователя.
+
+    Суммы читаются из поддерживаемой таблицы ShoppingCartIngredient.
+    Результат кешируется до смены версии корзины или справочника
+    ингредиентов.
+    """
+    key = SHOPPING_LIST_KEY.format(
+        user.id,
+        get_version(CART_VERSION.format(user.id)),
+        get_version(INGREDIENTS_CATALOG),
+    )
+    ingredients = cache.get(key)
+    if ingredients is None:
+        ingredients = [
+            {
+                'name': item['ingredient__name'],
+                'measurement_unit': item['ingredient__measurement_unit'],
+                'amount': item['amount'],
+            }
+            for item in ShoppingCartIngredient.objects.filter(user=user)
+            .values(
+                'ingredient__name', 'ingredient__measurement_unit', 'amount'
+            )
+            .order_by('ingredient__name')
+        ]
+        cache.set(key, ingredients)
+    return ingredients
+
+
+class Echo:
+    """Файлоподобный объект, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class TextRenderer:
+    """Список покупок обычным текстом."""
+
+    extension = 'txt'
+    content_type = 'text/plain;charset=UTF-8'
+
+    def __init__(self, ingredients, user, today):
+        self.ingredients = ingredients
+        self.user = user
+        self.today = today
+
+    def lines(self):
+        yield f'Список покупок для:{self.user.get_full_name()}'
+        yield ''
+        yield f'Дата:{self.today:%Y-%m-%d}'
+        yield ''
+        for ingredient in self.ingredients:
+            yield (
+                f' - {ingredient["name"]}'
+                f'({ingredient["measurement_unit"]})'
+                f' - {ingredient["amount"]}'
+            )
+        yield ''
+        yield f'Foodgram ({self.today:%Y})'
+
+    def render(self):
+        separator = ''
+        for line in self.lines():
+            yield f'{separator}{line}'.encode('utf-8')
+            separator = '\n'
+
+
+class CSVRenderer(TextRenderer):
+    """Список покупок в формате CSV."""
+
+    extension = 'csv'
+    content_type = 'text/csv;charset=UTF-8'
+
+    def render(self):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'amount')).encode(
+            'utf-8'
+        )
+        for ingredient in self.ingredients:
+            yield writer.writerow(
+                (
+                    ingredient['name'],
+                    ingredient['measurement_unit'],
+                    ingredient['amount'],
+                )
+            ).encode('utf-8')
+
+
+class JSONRenderer(TextRenderer):
+    """Список покупок в формате JSON."""
+
+    extension = 'json'
+    content_type = 'application/json'
+
+    def render(self):
+        user = json.dumps(self.user.get_full_name(), ensure_ascii=False)
+        yield (
+            f'{{"user": {user}, "date": "{self.today:%Y-%m-%d}", '
+            f'"ingredients": ['
+        ).encode('utf-8')
+        separator = ''
+        for ingredient in self.ingredients:
+            yield (
+                separator + json.dumps(ingredient, ensure_ascii=False)
+            ).encode('utf-8')
+            separator = ', '
+        yield b']}'
+
+
+class PDFRenderer(TextRenderer):
+    """Список покупок в PDF со стандартным шрифтом Helvetica.
+
+    Стандартные шрифты PDF не содержат кириллицы, поэтому текст
+    транслитерируется.
+    """
+
+    extension = 'pdf'
+    content_type = 'application/pdf'
+    lines_per_page = 50
+    font_size = 11
+    page_width = 595
+    page_height = 842
+    margin = 50
+
+    @staticmethod
+    def escape(line):
+        line = line.translate(TRANSLITERATION)
+        line = line.encode('latin-1', 'replace').decode('latin-1')
+        return (
+            line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+        )
+
+    def pages(self):
+        page = []
+        for line in self.lines():
+            page.append(self.escape(line))
+            if len(page) == self.lines_per_page:
+                yield page
+                page = []
+        if page:
+            yield page
+
+    def content(self, page):
+        leading = self.font_size * 1.4
+        top = self.page_height - self.margin
+        commands = [
+            'BT',
+            f'/F1 {self.font_size} Tf',
+            f'{leading:.1f} TL',
+            f'{self.margin} {top} Td',
+        ]
+        commands.extend(f'({line}) Tj T*' for line in page)
+        commands.append('ET')
+        return '\n'.join(commands).encode('latin-1')
+
+    def objects(self):
+        pages_count = -(-(len(self.ingredients) + 6) // self.lines_per_page)
+        kids = ' '.join(
+            f'{4 + 2 * number} 0 R' for number in range(pages_count)
+        )
+        yield b'<< /Type /Catalog /Pages 2 0 R >>'
+        yield (
+            f'<< /Type /Pages /Kids [{kids}] /Count {pages_count} >>'
+        ).encode('latin-1')
+        yield (
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica '
+            b'/Encoding /WinAnsiEncoding >>'
+        )
+        for number, page in enumerate(self.pages()):
+            yield (
+                f'<< /Type /Page /Parent 2 0 R '
+                f'/MediaBox [0 0 {self.page_width} {self.page_height}] '
+                f'/Resources << /Font << /F1 3 0 R >> >> '
+                f'/Contents {5 + 2 * number} 0 R >>'
+            ).encode('latin-1')
+            stream = self.content(page)
+            yield (
+                f'<< /Length {len(stream)} >>\nstream\n'.encode('latin-1')
+                + stream
+                + b'\nendstream'
+            )
+
+    def render(self):
+        chunk = b'%PDF-1.4\n'
+        offset = len(chunk)
+        offsets = []
+        yield chunk
+        for number, body in enumerate(self.objects(), start=1):
+            chunk = (
+                f'{number} 0 obj\n'.encode('latin-1') + body + b'\nendobj\n'
+            )
+            offsets.append(offset)
+            offset += len(chunk)
+            yield chunk
+        xref = [f'xref\n0 {len(offsets) + 1}\n0000000000 65535 f \n']
+        xref.extend(f'{position:010d} 00000 n \n' for position in offsets)
+        xref.append(
+            f'trailer\n<< /Size {len(offsets) + 1} /Root 1 0 R >>\n'
+            f'startxref\n{offset}\n%%EOF\n'
+        )
+        yield ''.join(xref).encode('latin-1')
+
+
+SHOPPING_LIST_RENDERERS = {
+    renderer.extension: renderer
+    for renderer in (TextRenderer, CSVRenderer, JSONRenderer, PDFRenderer)
+}
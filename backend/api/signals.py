@@ -0,0 +1,28 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from foodgram.cache import bump_versions
+from recipes.models import User
+
+from .authentication import get_token_version_name
+
+
+def bump_tokens(keys):
+    names = [get_token_version_name(key) for key in keys]
+    transaction.on_commit(lambda: bump_versions(names))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(instance, **kwargs):
+    bump_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def user_changed(instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    bump_tokens(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
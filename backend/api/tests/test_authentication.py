@@ -0,0 +1,93 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.authentication import TokenCache, token_cache
+from foodgram.cache import get_version
+
+URL = '/api/users/me/'
+
+
+@pytest.fixture(autouse=True)
+def empty_token_cache():
+    token_cache.clear()
+
+
+def get_me(client):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(URL)
+    return response, len(context.captured_queries)
+
+
+def test_known_token_skips_database(client):
+    hits = token_cache.hits
+    response, first = get_me(client)
+    assert response.status_code == 200
+    response, second = get_me(client)
+    assert response.status_code == 200
+    assert second < first
+    assert token_cache.hits == hits + 1
+
+
+def test_logout_evicts_token(client, django_capture_on_commit_callbacks):
+    assert get_me(client)[0].status_code == 200
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post('/api/auth/token/logout/')
+    assert response.status_code == 204
+    assert get_me(client)[0].status_code == 401
+
+
+def test_deactivation_evicts_user(
+    user, client, django_capture_on_commit_callbacks
+):
+    assert get_me(client)[0].status_code == 200
+    with django_capture_on_commit_callbacks(execute=True):
+        user.is_active = False
+        user.save()
+    assert get_me(client)[0].status_code == 401
+
+
+def test_password_change_evicts_token(
+    client, django_capture_on_commit_callbacks
+):
+    assert get_me(client)[0].status_code == 200
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(
+            '/api/users/set_password/',
+            {
+                'current_password': 'secret-password-123',
+                'new_password': 'new-secret-password-456',
+            },
+        )
+    assert response.status_code == 204
+    misses = token_cache.misses
+    assert get_me(client)[0].status_code == 200
+    assert token_cache.misses == misses + 1
+
+
+def test_user_change_is_visible(
+    user, client, django_capture_on_commit_callbacks
+):
+    assert get_me(client)[0].json()['first_name'] == 'Имя'
+    with django_capture_on_commit_callbacks(execute=True):
+        user.first_name = 'Другое'
+        user.save()
+    assert get_me(client)[0].json()['first_name'] == 'Другое'
+
+
+def test_least_recently_used_entry_is_evicted(user):
+    cache = TokenCache(max_entries=2, timeout=60)
+    version = get_version('token-test')
+    for key in 'abc':
+        if key == 'c':
+            assert cache.get('a') is not None
+        cache.set(key, user, None, 'token-test', version)
+    assert cache.get('b') is None
+    assert cache.stats()['entries'] == 2
+
+
+def test_expired_entry_is_not_returned(user):
+    cache = TokenCache(max_entries=2, timeout=0)
+    cache.set('a', user, None, 'token-test', get_version('token-test'))
+    assert cache.get('a') is None
+    assert cache.stats()['entries'] == 0
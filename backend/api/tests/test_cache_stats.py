@@ -0,0 +1,29 @@
+import pytest
+
+URL = '/api/cache-stats/'
+
+
+@pytest.fixture
+def staff_client(make_user, make_client):
+    staff = make_user('staff')
+    staff.is_staff = True
+    staff.save()
+    return make_client(staff)
+
+
+def test_cache_stats_is_staff_only(anonymous_client, client):
+    assert anonymous_client.get(URL).status_code == 401
+    assert client.get(URL).status_code == 403
+
+
+def test_cache_stats_counts_response_cache(
+    staff_client, anonymous_client, tags
+):
+    before = staff_client.get(URL).json()['responses']
+    for _ in range(3):
+        assert anonymous_client.get('/api/recipes/').status_code == 200
+    after = staff_client.get(URL).json()['responses']
+    assert after['misses'] - before['misses'] == 1
+    assert after['hits'] - before['hits'] == 2
+    assert set(after) >= {'hits', 'misses'}
+    assert 'entries' in staff_client.get(URL).json()['tokens']
@@ -0,0 +1,140 @@
+import re
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import IngredientInRecipe, Recipe
+
+WRITE = re.compile(
+    r'(?:INSERT(?: OR IGNORE)? INTO|UPDATE|DELETE FROM) "(\w+)"'
+)
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200, response.content
+    return len(context.captured_queries), response
+
+
+def patch_writes(client, recipe, data):
+    """PATCH рецепта и таблицы, в которые он писал."""
+    with CaptureQueriesContext(connection) as context:
+        response = client.patch(
+            f'/api/recipes/{recipe.id}/', data, format='json'
+        )
+    assert response.status_code == 200, response.content
+    return [
+        match.group(1)
+        for match in (
+            WRITE.match(query['sql']) for query in context.captured_queries
+        )
+        if match
+    ]
+
+
+@pytest.mark.parametrize('authenticated', (False, True))
+def test_recipe_list_queries_do_not_depend_on_page_size(
+    authenticated, user, client, anonymous_client, make_recipe
+):
+    if not authenticated:
+        client = anonymous_client
+    for number in range(20):
+        make_recipe(user, name=f'Рецепт {number}')
+    count_queries(client, '/api/recipes/?limit=1')
+    small, response = count_queries(client, '/api/recipes/?limit=2')
+    assert len(response.json()['results']) == 2
+    large, response = count_queries(client, '/api/recipes/?limit=20')
+    assert len(response.json()['results']) == 20
+    assert small == large
+
+
+def get_items(recipe):
+    return dict(
+        IngredientInRecipe.objects.filter(recipe=recipe).values_list(
+            'ingredient_id', 'id'
+        )
+    )
+
+
+def test_patch_without_changes_writes_nothing(
+    user, client, make_recipe, tags, ingredients
+):
+    recipe = make_recipe(user, recipe_tags=tags[:2])
+    updated_at = recipe.updated_at
+    writes = patch_writes(
+        client,
+        recipe,
+        {
+            'name': recipe.name,
+            'tags': [tags[1].id, tags[0].id],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': 100}
+                for ingredient in ingredients[:2]
+            ],
+        },
+    )
+    assert writes == []
+    recipe.refresh_from_db()
+    assert recipe.updated_at == updated_at
+
+
+def test_patch_text_touches_only_recipe_row(user, client, make_recipe):
+    recipe = make_recipe(user)
+    items = get_items(recipe)
+    writes = patch_writes(client, recipe, {'text': 'Новое описание'})
+    assert writes == ['recipes_recipe']
+    recipe.refresh_from_db()
+    assert recipe.text == 'Новое описание'
+    assert get_items(recipe) == items
+
+
+def test_patch_ingredients_writes_only_difference(
+    user, client, make_recipe, ingredients
+):
+    flour, sugar, salt, _ = ingredients
+    recipe = make_recipe(
+        user, amounts={flour.id: 100, sugar.id: 50, salt.id: 5}
+    )
+    items = get_items(recipe)
+    writes = patch_writes(
+        client,
+        recipe,
+        {
+            'ingredients': [
+                {'id': flour.id, 'amount': 100},
+                {'id': sugar.id, 'amount': 70},
+                {'id': ingredients[3].id, 'amount': 2},
+            ]
+        },
+    )
+    assert writes.count('recipes_ingredientinrecipe') == 3
+    assert 'recipes_recipe_tags' not in writes
+    new_items = get_items(recipe)
+    assert new_items[flour.id] == items[flour.id]
+    assert new_items[sugar.id] == items[sugar.id]
+    assert salt.id not in new_items
+    assert dict(
+        IngredientInRecipe.objects.filter(recipe=recipe).values_list(
+            'ingredient_id', 'amount'
+        )
+    ) == {flour.id: 100, sugar.id: 70, ingredients[3].id: 2}
+
+
+def test_patch_tags_replaces_only_difference(
+    user, client, make_recipe, tags
+):
+    recipe = make_recipe(user, recipe_tags=tags[:2])
+    through = Recipe.tags.through.objects.filter(recipe=recipe)
+    kept = through.get(tag=tags[0]).id
+    writes = patch_writes(
+        client, recipe, {'tags': [tags[0].id, tags[2].id]}
+    )
+    assert writes.count('recipes_recipe_tags') == 2
+    assert 'recipes_ingredientinrecipe' not in writes
+    assert set(through.values_list('tag_id', flat=True)) == {
+        tags[0].id,
+        tags[2].id,
+    }
+    assert through.get(tag=tags[0]).id == kept
@@ -0,0 +1,51 @@
+from api.response_cache import response_cache
+from api.views import RecipeViewSet
+from foodgram.cache import bump_version, get_versions
+from foodgram.constants import RECIPE_VERSION, RECIPES_LIST
+
+
+def test_known_version_changed_during_build_is_not_cached():
+    versions = get_versions([RECIPES_LIST])
+    bump_version(RECIPES_LIST)
+    assert not response_cache.set('response:test', {}, [], versions)
+    assert response_cache.get('response:test') is None
+
+
+def test_list_changed_during_build_is_not_cached(
+    monkeypatch, anonymous_client, user, make_recipe
+):
+    make_recipe(user)
+    paginate_queryset = RecipeViewSet.paginate_queryset
+
+    def paginate_and_write(self, queryset):
+        page = paginate_queryset(self, queryset)
+        # Рецепт создан, пока строился ответ.
+        bump_version(RECIPES_LIST)
+        return page
+
+    monkeypatch.setattr(
+        RecipeViewSet, 'paginate_queryset', paginate_and_write
+    )
+    for _ in range(2):
+        response = anonymous_client.get('/api/recipes/')
+        assert response['X-Cache'] == 'MISS'
+    monkeypatch.undo()
+    assert anonymous_client.get('/api/recipes/')['X-Cache'] == 'MISS'
+    assert anonymous_client.get('/api/recipes/')['X-Cache'] == 'HIT'
+
+
+def test_detail_changed_during_build_is_not_cached(
+    monkeypatch, anonymous_client, user, make_recipe
+):
+    recipe = make_recipe(user)
+    get_object = RecipeViewSet.get_object
+
+    def get_object_and_write(self):
+        instance = get_object(self)
+        bump_version(RECIPE_VERSION.format(recipe.id))
+        return instance
+
+    monkeypatch.setattr(RecipeViewSet, 'get_object', get_object_and_write)
+    url = f'/api/recipes/{recipe.id}/'
+    for _ in range(2):
+        assert anonymous_client.get(url)['X-Cache'] == 'MISS'
@@ -0,0 +1,47 @@
+import pytest
+
+from api.search import IngredientIndex
+
+NAMES = ('Молоко', 'молоко топлёное', 'Кокосовое молоко', 'мука', 'Ёжевика')
+
+
+@pytest.fixture
+def index():
+    return IngredientIndex(
+        [{'id': number, 'name': name} for number, name in enumerate(NAMES)]
+    )
+
+
+def search(index, query, limit=10):
+    return [row['name'] for row in index.search(query, limit)]
+
+
+def test_prefix_matches_come_before_substring_matches(index):
+    assert search(index, 'МОЛ') == [
+        'Молоко',
+        'молоко топлёное',
+        'Кокосовое молоко',
+    ]
+
+
+@pytest.mark.parametrize(
+    'query, expected',
+    (
+        ('око', ['Молоко', 'молоко топлёное', 'Кокосовое молоко']),
+        ('ое м', ['Кокосовое молоко']),
+        ('ка', ['мука', 'Ёжевика']),
+        ('ж', ['Ёжевика']),
+        ('ТОПЛЕН', ['молоко топлёное']),
+    ),
+)
+def test_substring_matches(index, query, expected):
+    assert search(index, query) == expected
+
+
+@pytest.mark.parametrize('query', ('щщ', 'ъ', 'молокоо', 'ко\nмо', ''))
+def test_misses(index, query):
+    assert search(index, query) == []
+
+
+def test_limit(index):
+    assert search(index, 'о', limit=2) == ['Молоко', 'молоко топлёное']
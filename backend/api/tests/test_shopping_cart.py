@@ -0,0 +1,59 @@
+from recipes.models import ShoppingCartIngredient
+from recipes.services import rebuild_shopping_lists
+
+
+def get_totals(user):
+    return dict(
+        ShoppingCartIngredient.objects.filter(user=user).values_list(
+            'ingredient__name', 'amount'
+        )
+    )
+
+
+def test_totals_follow_cart_and_recipe_changes(
+    user, client, make_user, make_client, make_recipe, ingredients
+):
+    flour, sugar, salt, _ = ingredients
+    author = make_user('author')
+    first = make_recipe(author, amounts={flour.id: 100, sugar.id: 50})
+    second = make_recipe(author, amounts={flour.id: 200, salt.id: 5})
+
+    client.post(f'/api/recipes/{first.id}/shopping_cart/')
+    client.post(f'/api/recipes/{second.id}/shopping_cart/')
+    assert get_totals(user) == {'мука': 300, 'сахар': 50, 'соль': 5}
+
+    response = make_client(author).patch(
+        f'/api/recipes/{first.id}/',
+        {
+            'ingredients': [
+                {'id': flour.id, 'amount': 150},
+                {'id': salt.id, 'amount': 10},
+            ]
+        },
+        format='json',
+    )
+    assert response.status_code == 200, response.content
+    assert get_totals(user) == {'мука': 350, 'соль': 15}
+
+    client.delete(f'/api/recipes/{second.id}/shopping_cart/')
+    assert get_totals(user) == {'мука': 150, 'соль': 10}
+
+    first.delete()
+    assert get_totals(user) == {}
+
+
+def test_totals_match_rebuild(user, client, make_recipe, ingredients):
+    flour, sugar, *_ = ingredients
+    recipes = [
+        make_recipe(user, amounts={flour.id: 10 * n, sugar.id: n})
+        for n in range(1, 4)
+    ]
+    client.post(
+        '/api/recipes/shopping_cart/',
+        {'recipes': [recipe.id for recipe in recipes]},
+        format='json',
+    )
+    totals = get_totals(user)
+    assert totals == {'мука': 60, 'сахар': 6}
+    rebuild_shopping_lists()
+    assert get_totals(user) == totals
@@ -0,0 +1,86 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from users.models import Subscription
+
+
+@pytest.mark.parametrize('value', ('-1', 'abc'))
+def test_invalid_recipes_limit_is_rejected(value, client, make_user):
+    author = make_user('author')
+    client.post(f'/api/users/{author.id}/subscribe/')
+    response = client.get(f'/api/users/subscriptions/?recipes_limit={value}')
+    assert response.status_code == 400
+    assert 'recipes_limit' in response.json()
+
+
+def test_recipes_limit_cuts_latest_recipes(client, make_user, make_recipe):
+    author = make_user('author')
+    for number in range(3):
+        make_recipe(author, name=f'Рецепт {number}')
+    client.post(f'/api/users/{author.id}/subscribe/')
+    response = client.get('/api/users/subscriptions/?recipes_limit=2')
+    assert response.status_code == 200
+    result = response.json()['results'][0]
+    assert result['recipes_count'] == 3
+    assert [recipe['name'] for recipe in result['recipes']] == [
+        'Рецепт 2',
+        'Рецепт 1',
+    ]
+
+
+@pytest.mark.parametrize('value', ('-1', 'abc'))
+def test_invalid_recipes_limit_does_not_subscribe(
+    value, user, client, make_user
+):
+    author = make_user('author')
+    response = client.post(
+        f'/api/users/{author.id}/subscribe/?recipes_limit={value}'
+    )
+    assert response.status_code == 400
+    assert not Subscription.objects.filter(user=user).exists()
+
+
+def test_subscribe_returns_latest_recipes(client, make_user, make_recipe):
+    author = make_user('author')
+    for number in range(3):
+        make_recipe(author, name=f'Рецепт {number}')
+    response = client.post(
+        f'/api/users/{author.id}/subscribe/?recipes_limit=1'
+    )
+    assert response.status_code == 201
+    assert [recipe['name'] for recipe in response.json()['recipes']] == [
+        'Рецепт 2'
+    ]
+
+
+def test_latest_recipes_of_many_authors_in_one_query(
+    client, make_user, make_recipe
+):
+    authors = [make_user(f'author{number}') for number in range(3)]
+    for author in authors:
+        client.post(f'/api/users/{author.id}/subscribe/')
+        for number in range(authors.index(author) + 2):
+            make_recipe(author, name=f'{author.username} {number}')
+    queries = []
+    for limit in (1, 3):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(
+                f'/api/users/subscriptions/?recipes_limit={limit}'
+            )
+        assert response.status_code == 200
+        queries.append(len(context.captured_queries))
+        results = {
+            result['username']: [
+                recipe['name'] for recipe in result['recipes']
+            ]
+            for result in response.json()['results']
+        }
+        assert results == {
+            author.username: [
+                f'{author.username} {number}'
+                for number in reversed(range(authors.index(author) + 2))
+            ][:limit]
+            for author in authors
+        }
+    assert queries[0] == queries[1]
@@ -0,0 +1,105 @@
+import base64
+import io
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+
+from api.uploads import get_image_too_large_message
+from recipes.models import Recipe
+
+
+def make_png(size=(8, 8)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def make_data(tags, ingredients, image):
+    data = {
+        'name': 'Рецепт',
+        'text': 'Описание',
+        'cooking_time': 10,
+        'tags': [tag.id for tag in tags[:2]],
+        'image': image,
+    }
+    for number, ingredient in enumerate(ingredients[:2]):
+        data[f'ingredients[{number}]id'] = ingredient.id
+        data[f'ingredients[{number}]amount'] = 10 * (number + 1)
+    return data
+
+
+def test_multipart_create(client, tags, ingredients):
+    image = SimpleUploadedFile('image.png', make_png(), 'image/png')
+    response = client.post(
+        '/api/recipes/',
+        make_data(tags, ingredients, image),
+        format='multipart',
+    )
+    assert response.status_code == 201, response.content
+    recipe = Recipe.objects.get(id=response.json()['id'])
+    assert recipe.image.name.endswith('.png')
+    assert dict(
+        recipe.ingredient_list.values_list('ingredient_id', 'amount')
+    ) == {ingredients[0].id: 10, ingredients[1].id: 20}
+    assert set(recipe.tags.values_list('id', flat=True)) == {
+        tags[0].id,
+        tags[1].id,
+    }
+
+
+def test_multipart_patch(user, client, make_recipe):
+    recipe = make_recipe(user)
+    image = SimpleUploadedFile('new.png', make_png((16, 16)), 'image/png')
+    response = client.patch(
+        f'/api/recipes/{recipe.id}/',
+        {'name': 'Новое название', 'image': image},
+        format='multipart',
+    )
+    assert response.status_code == 200, response.content
+    recipe.refresh_from_db()
+    assert recipe.name == 'Новое название'
+    assert recipe.image.name != 'recipes/image.png'
+
+
+@pytest.mark.parametrize('fields_size', (None, 100))
+def test_oversized_multipart_upload_is_rejected(
+    fields_size, settings, client, tags, ingredients
+):
+    settings.RECIPE_IMAGE_MAX_SIZE = 1000
+    settings.DATA_UPLOAD_MAX_MEMORY_SIZE = fields_size
+    image = SimpleUploadedFile(
+        'image.png', make_png((200, 200)) + b'0' * 5000, 'image/png'
+    )
+    response = client.post(
+        '/api/recipes/',
+        make_data(tags, ingredients, image),
+        format='multipart',
+    )
+    assert response.status_code == 400
+    assert get_image_too_large_message() in response.json()['detail']
+    assert not Recipe.objects.exists()
+
+
+def test_oversized_base64_image_is_rejected(
+    settings, client, tags, ingredients
+):
+    settings.RECIPE_IMAGE_MAX_SIZE = 1000
+    image = 'data:image/png;base64,' + base64.b64encode(
+        make_png((200, 200)) + b'0' * 2000
+    ).decode()
+    response = client.post(
+        '/api/recipes/',
+        {
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'tags': [tags[0].id],
+            'ingredients': [{'id': ingredients[0].id, 'amount': 10}],
+            'image': image,
+        },
+        format='json',
+    )
+    assert response.status_code == 400
+    assert response.json()['image'] == [get_image_too_large_message()]
+    assert not Recipe.objects.exists()
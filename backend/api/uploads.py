@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+from django.template.defaultfilters import filesizeformat
+
+IMAGE_TOO_LARGE = 'Размер изображения не должен превышать {}'
+
+
+def get_image_too_large_message():
+    return IMAGE_TOO_LARGE.format(
+        filesizeformat(settings.RECIPE_IMAGE_MAX_SIZE)
+    )
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """Загрузка файлов сразу во временный файл с ограничением размера.
+
+    Файл пишется на диск частями по chunk_size байт, а загрузка
+    прерывается, как только размер файла превысил
+    RECIPE_IMAGE_MAX_SIZE, поэтому память на загрузку не зависит от
+    размера изображения.
+    """
+
+    def handle_raw_input(
+        self, input_data, META, content_length, boundary, encoding=None
+    ):
+        fields_size = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        if fields_size is not None and content_length > (
+            settings.RECIPE_IMAGE_MAX_SIZE + fields_size
+        ):
+            raise MultiPartParserError(get_image_too_large_message())
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.file.close()
+            raise MultiPartParserError(get_image_too_large_message())
+        return super().receive_data_chunk(raw_data, start)
@@ -2,6 +2,7 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from .views import (
+    CacheStatsView,
     CustomUserViewSet,
     IngredientViewSet,
     RecipeViewSet,
@@ -20,4 +21,5 @@ router.register('users', CustomUserViewSet, basename='users')
 urlpatterns = [
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
+    path('cache-stats/', CacheStatsView.as_view(), name='cache-stats'),
 ]
@@ -1,24 +1,167 @@
-import io
-
-
-def create_bucket(ingredients, today_full, today_y, user):
-    string = 'Список покупок для:' + user + '\n\nДата:' + today_full + '\n\n'
-    string += '\n'.join(
-        [
-            f' - {ingredient["ingredient__name"]}'
-            f'({ingredient["ingredient__measurement_unit"]})'
-            f' - {ingredient["amount"]}'
-            for ingredient in ingredients
-        ]
+import hashlib
+from array import array
+
+from django.core.cache import cache
+from django.db.models import Count, Prefetch
+from django.db.models.expressions import RawSQL
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.exceptions import ValidationError
+
+from foodgram.cache import get_version
+from recipes.models import IngredientInRecipe, Recipe
+from recipes.services import USER_RECIPES_VERSIONS
+from users.constants import LIMIT_RECIPE
+from users.models import Subscription
+
+
+def get_ingredients_prefetch():
+    """Ингредиенты рецептов одним запросом вместе с их единицами."""
+    return Prefetch(
+        'ingredient_list',
+        queryset=IngredientInRecipe.objects.select_related(
+            'ingredient'
+        ).order_by('ingredient__name'),
     )
-    string += '\n\nFoodgram (' + today_y + ')'
 
-    return string
+
+def set_prefetched(instance, name, objects):
+    """Заполнить кеш prefetch_related связи name готовыми объектами."""
+    cache = instance.__dict__.setdefault('_prefetched_objects_cache', {})
+    cache.pop(name, None)
+    queryset = getattr(instance, name).all()
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    cache[name] = queryset
+
+
+def get_objects_in_bulk(queryset, ids, field, message):
+    """Объекты queryset по списку id одним запросом в порядке ids.
+
+    Если часть id не найдена, поднимает ValidationError со списком
+    отсутствующих id.
+    """
+    objects = queryset.in_bulk(ids)
+    missing = [pk for pk in ids if pk not in objects]
+    if missing:
+        raise ValidationError(
+            {field: f'{message}: {", ".join(map(str, missing))}'}
+        )
+    return [objects[pk] for pk in ids]
+
+
+USER_RECIPES_KEY = 'user-recipes:{}:{}'
+
+
+def get_user_recipe_ids(model, user):
+    """Id рецептов пользователя в избранном или корзине (по model).
+
+    Набор хранится в кеше компактным массивом чисел до смены версии
+    избранного или корзины пользователя.
+    """
+    if user.is_anonymous:
+        return frozenset()
+    name = USER_RECIPES_VERSIONS[model].format(user.id)
+    key = USER_RECIPES_KEY.format(name, get_version(name))
+    recipe_ids = cache.get(key)
+    if recipe_ids is None:
+        recipe_ids = array(
+            'q',
+            model.objects.filter(user=user)
+            .order_by('recipe_id')
+            .values_list('recipe_id', flat=True),
+        )
+        cache.set(key, recipe_ids)
+    return frozenset(recipe_ids)
+
+
+def get_image_variants(recipe, extension):
+    """Копии текущего изображения рецепта в формате extension.
+
+    Копии отсортированы по возрастанию ширины; пока они не построены,
+    список пуст.
+    """
+    image_variants = recipe.image_variants
+    if not recipe.image or image_variants.get('source') != recipe.image.name:
+        return []
+    return sorted(
+        (
+            variant
+            for variant in image_variants['variants']
+            if variant['format'] == extension
+        ),
+        key=lambda variant: variant['width'],
+    )
 
 
-def create_shopping_list_buffer(ingredients, today_full, today_y, user):
-    shoping_list = create_bucket(ingredients, today_full, today_y, user)
-    shopping_list_buffer = io.BytesIO()
-    shopping_list_buffer.write(shoping_list.encode("utf-8"))
-    shopping_list_buffer.seek(0)
-    return shopping_list_buffer
+def get_subscribed_authors(user, author_ids):
+    """Id авторов из author_ids, на которых подписан пользователь."""
+    if user.is_anonymous:
+        return set()
+    return set(
+        Subscription.objects.filter(
+            user=user, author_id__in=set(author_ids)
+        ).values_list('author_id', flat=True)
+    )
+
+
+def make_etag(*parts):
+    """Строгий ETag из частей, однозначно задающих ответ."""
+    digest = hashlib.md5('|'.join(str(part) for part in parts).encode('utf-8'))
+    return quote_etag(digest.hexdigest())
+
+
+def etag_matches(request, etag):
+    """Совпадает ли etag с заголовком If-None-Match запроса."""
+    etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    return '*' in etags or etag in etags
+
+
+def get_recipes_limit(request):
+    """Значение параметра recipes_limit из запроса."""
+    try:
+        limit = int(request.query_params.get('recipes_limit', default=0))
+    except ValueError:
+        raise ValidationError({'recipes_limit': LIMIT_RECIPE})
+    if limit < 0:
+        raise ValidationError({'recipes_limit': LIMIT_RECIPE})
+    return limit
+
+
+def get_latest_recipe_ids(authors, recipes_limit):
+    """Подзапрос id последних recipes_limit рецептов каждого из authors.
+
+    Рецепты нумеруются ROW_NUMBER() в пределах автора, и отбираются
+    первые номера. Django 3.2 не умеет фильтровать по оконной функции,
+    поэтому подзапрос собирается вручную.
+    """
+    authors_sql, authors_params = (
+        authors.order_by().values('id').query.sql_with_params()
+    )
+    return RawSQL(
+        'SELECT id FROM ('
+        'SELECT id, ROW_NUMBER() OVER ('
+        'PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+        f') AS number FROM {Recipe._meta.db_table} '
+        f'WHERE author_id IN ({authors_sql})'
+        ') AS ranked WHERE number <= %s',
+        (*authors_params, recipes_limit),
+    )
+
+
+def get_subscription_authors(queryset, recipes_limit):
+    """Авторы с числом рецептов и последними recipes_limit рецептами.
+
+    Последние рецепты всех авторов выбираются одним запросом с оконной
+    функцией, которую обслуживает индекс (author, -pub_date, -id).
+    """
+    return queryset.annotate(
+        recipes_count=Count('recipes', distinct=True)
+    ).prefetch_related(
+        Prefetch(
+            'recipes',
+            queryset=Recipe.objects.filter(
+                id__in=get_latest_recipe_ids(queryset, recipes_limit)
+            ).order_by('-pub_date', '-id'),
+            to_attr='latest_recipes',
+        )
+    )
@@ -1,54 +1,153 @@
-from django.db.models import Count, Exists, OuterRef, Sum
-from django.http import HttpResponse
+import os
+from functools import partial
+
+from django.conf import settings
+from django.db.models import Max
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from django.utils.http import http_date
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from rest_framework import response, status
 from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import (
+    SAFE_METHODS,
+    IsAdminUser,
+    IsAuthenticated,
+)
 from rest_framework.response import Response
 from rest_framework.status import HTTP_400_BAD_REQUEST
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 
+from foodgram.cache import get_versions
+from foodgram.constants import (
+    AUTHOR_VERSION,
+    AUTHORS,
+    CART_VERSION,
+    FAVORITES_VERSION,
+    INGREDIENTS_CATALOG,
+    RECIPE_VERSION,
+    RECIPES_LIST,
+    RECIPES_POPULARITY,
+    SUBSCRIPTIONS_VERSION,
+    TAGS_CATALOG,
+)
 from recipes.models import (
     Favourite,
     Ingredient,
-    IngredientInRecipe,
     Recipe,
     ShoppingCart,
     Tag,
     User,
 )
+from recipes.services import add_user_recipes, remove_user_recipes
 from users.models import Subscription
 
-from .filters import IngredientFilter, RecipeFilter
-from .pagination import CustomPagination
+from .authentication import token_cache
+from .catalog import (
+    fuzzy_search_ingredients,
+    ingredients_catalog,
+    tags_catalog,
+)
+from .filters import RecipeFilter
+from .pagination import CustomPagination, RecipePagination
 from .permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
+from .response_cache import recipe_dependencies, response_cache
 from .serializers import (
     CustomUserSerializer,
     FavoritSerializer,
     IngredientSerializer,
+    RecipeIdsSerializer,
     RecipeReadSerializer,
+    RecipeShortSerializer,
     RecipeWriteSerializer,
     ShoppingCartSerializer,
     ShowSubscriptionsSerializer,
     SubscriptionSerializer,
     TagSerializer,
 )
-from .utils import create_shopping_list_buffer
+from .shopping_list import (
+    SHOPPING_LIST_RENDERERS,
+    TextRenderer,
+    get_shopping_list,
+)
+from .uploads import LimitedTemporaryFileUploadHandler
+from .utils import (
+    etag_matches,
+    get_ingredients_prefetch,
+    get_objects_in_bulk,
+    get_recipes_limit,
+    get_subscribed_authors,
+    get_subscription_authors,
+    make_etag,
+)
+
+
+class SubscribedAuthorsMixin:
+    """Подписки на всех авторов страницы одним запросом."""
+
+    author_id_field = 'id'
+
+    def get_serializer(self, *args, **kwargs):
+        if args and kwargs.get('many'):
+            context = kwargs.setdefault(
+                'context', self.get_serializer_context()
+            )
+            context['subscribed_authors'] = get_subscribed_authors(
+                self.request.user,
+                (getattr(obj, self.author_id_field) for obj in args[0]),
+            )
+        return super().get_serializer(*args, **kwargs)
 
 
-class CustomUserViewSet(UserViewSet):
+class AnonymousCacheMixin:
+    """Ответы анонимным пользователям из общего кеша ответов."""
+
+    def cached_response(
+        self, request, get_response, get_dependencies, names=()
+    ):
+        """Ответ из кеша или построенный и сохранённый в кеш.
+
+        Версии names известны до построения ответа и читаются заранее:
+        если за время построения одна из них сменилась, ответ мог
+        собраться из старых данных и в кеш не попадает.
+        """
+        if (
+            request.user.is_authenticated
+            or request.accepted_renderer.format != 'json'
+        ):
+            return get_response()
+        key = response_cache.make_key(request)
+        data = response_cache.get(key)
+        if data is not None:
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+        versions = get_versions(names)
+        response = get_response()
+        if response.status_code == status.HTTP_200_OK:
+            response_cache.set(
+                key, response.data, get_dependencies(response.data), versions
+            )
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+class CustomUserViewSet(SubscribedAuthorsMixin, UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     pagination_class = CustomPagination
 
     @staticmethod
-    def adding_author(add_serializer, model, request, author_id):
+    def adding_author(add_serializer, model, request, author_id, **context):
         """Кастомный метод добавления author и получения данных."""
         user = request.user
         data = {'user': user.id, 'author': author_id}
-        serializer = add_serializer(data=data, context={'request': request})
+        serializer = add_serializer(
+            data=data, context={'request': request, **context}
+        )
         serializer.is_valid(raise_exception=True)
         serializer.save()
         return response.Response(
@@ -60,13 +159,18 @@ class CustomUserViewSet(UserViewSet):
         detail=False, methods=['get'], permission_classes=(IsAuthenticated,)
     )
     def subscriptions(self, request):
-        queryset = User.objects.filter(author__user=request.user).annotate(
-            recipes_count=Count('follower')
+        queryset = get_subscription_authors(
+            User.objects.filter(author__user=request.user),
+            get_recipes_limit(request),
         )
+        page = self.paginate_queryset(queryset)
         serialized_data = ShowSubscriptionsSerializer(
-            self.paginate_queryset(queryset),
+            page,
             many=True,
-            context={'request': request},
+            context={
+                'request': request,
+                'subscribed_authors': {author.id for author in page},
+            },
         ).data
 
         return self.get_paginated_response(serialized_data)
@@ -77,8 +181,13 @@ class CustomUserViewSet(UserViewSet):
         permission_classes=[IsAuthenticated],
     )
     def subscribe(self, request, id):
+        # Параметры проверяются до создания подписки.
         return self.adding_author(
-            SubscriptionSerializer, Subscription, request, id
+            SubscriptionSerializer,
+            Subscription,
+            request,
+            id,
+            recipes_limit=get_recipes_limit(request),
         )
 
     @subscribe.mapping.delete
@@ -97,41 +206,185 @@ class CustomUserViewSet(UserViewSet):
             )
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class CatalogViewSetMixin:
+    """Справочник из кеша процесса с ответами 304 по ETag."""
+
+    catalog = None
+
+    def catalog_response(self, request, version, get_data):
+        etag = make_etag(self.catalog.name, version, request.get_full_path())
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(get_data())
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        version, catalog = self.catalog.get()
+        return self.catalog_response(request, version, lambda: catalog.rows)
+
+    def retrieve(self, request, *args, **kwargs):
+        version, catalog = self.catalog.get()
+        try:
+            row = catalog.by_id[int(kwargs[self.lookup_field])]
+        except (KeyError, ValueError):
+            raise NotFound
+        return self.catalog_response(request, version, lambda: row)
+
+
+class IngredientViewSet(CatalogViewSetMixin, ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAdminOrReadOnly,)
-    filter_backends = (DjangoFilterBackend,)
-    filterset_class = IngredientFilter
+    catalog = ingredients_catalog
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            return super().list(request, *args, **kwargs)
+        version, catalog = self.catalog.get()
+        if request.query_params.get('fuzzy') in ('1', 'true'):
+            search = partial(fuzzy_search_ingredients, catalog)
+        else:
+            search = catalog.index.search
+        return self.catalog_response(
+            request,
+            version,
+            lambda: search(name, settings.INGREDIENT_SEARCH_LIMIT),
+        )
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(CatalogViewSetMixin, ReadOnlyModelViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
+    catalog = tags_catalog
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(AnonymousCacheMixin, SubscribedAuthorsMixin, ModelViewSet):
     queryset = Recipe.objects.all()
+    author_id_field = 'author_id'
     permission_classes = (IsAuthorOrReadOnly | IsAdminOrReadOnly,)
-    pagination_class = CustomPagination
+    pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def initialize_request(self, request, *args, **kwargs):
+        """Изображение из multipart пишется во временный файл частями."""
+        request = super().initialize_request(request, *args, **kwargs)
+        if self.action in ('create', 'update', 'partial_update'):
+            request._request.upload_handlers = [
+                LimitedTemporaryFileUploadHandler(request._request)
+            ]
+        return request
+
     def get_queryset(self):
+        return Recipe.objects.select_related('author').prefetch_related(
+            'tags', get_ingredients_prefetch()
+        )
+
+    def get_list_names(self):
+        """Версии, от которых зависят состав и порядок списка."""
+        names = [RECIPES_LIST]
+        if self.request.query_params.get('ordering') == 'popular':
+            names.append(RECIPES_POPULARITY)
+        return names
+
+    def list_dependencies(self, data):
+        dependencies = self.get_list_names()
+        for recipe in data['results'] if 'results' in data else data:
+            dependencies.extend(recipe_dependencies(recipe))
+        return dependencies
+
+    def get_personal_versions(self):
+        """Версии данных, от которых зависят личные поля ответа."""
         user = self.request.user
-        queryset = Recipe.objects.select_related('author').prefetch_related(
-            'tags', 'ingredients'
+        if user.is_anonymous:
+            return []
+        return [
+            FAVORITES_VERSION.format(user.id),
+            CART_VERSION.format(user.id),
+            SUBSCRIPTIONS_VERSION.format(user.id),
+        ]
+
+    def conditional_response(
+        self, request, names, last_modified, get_response, *parts
+    ):
+        """Ответ 304 по ETag из версий names до построения ответа."""
+        versions = get_versions(names)
+        etag = make_etag(
+            request.get_host(),
+            request.get_full_path(),
+            request.accepted_renderer.format,
+            request.user.id,
+            last_modified,
+            *parts,
+            *(versions[name] for name in names),
         )
-        queryset = queryset.annotate(
-            is_favorited=Exists(
-                Favourite.objects.filter(user=user, recipe=OuterRef('id'))
-            ),
-            is_in_shopping_cart=Exists(
-                ShoppingCart.objects.filter(user=user, recipe=OuterRef('id'))
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = get_response()
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
+
+    def list(self, request, *args, **kwargs):
+        last_modified = (
+            self.filter_queryset(self.get_queryset())
+            .order_by()
+            .aggregate(last_modified=Max('updated_at'))['last_modified']
+        )
+        names = [
+            *self.get_list_names(),
+            AUTHORS,
+            TAGS_CATALOG,
+            INGREDIENTS_CATALOG,
+            *self.get_personal_versions(),
+        ]
+        return self.conditional_response(
+            request,
+            names,
+            last_modified,
+            partial(
+                self.cached_response,
+                request,
+                partial(super().list, request, *args, **kwargs),
+                self.list_dependencies,
+                self.get_list_names(),
             ),
         )
-        return queryset
+
+    def retrieve(self, request, *args, **kwargs):
+        get_response = partial(
+            self.cached_response,
+            request,
+            partial(super().retrieve, request, *args, **kwargs),
+            lambda data: list(recipe_dependencies(data)),
+            [RECIPE_VERSION.format(kwargs[self.lookup_field])],
+        )
+        try:
+            row = (
+                Recipe.objects.filter(pk=kwargs[self.lookup_field])
+                .values_list('updated_at', 'author_id')
+                .first()
+            )
+        except ValueError:
+            row = None
+        if row is None:
+            return get_response()
+        last_modified, author_id = row
+        names = [
+            AUTHOR_VERSION.format(author_id),
+            TAGS_CATALOG,
+            INGREDIENTS_CATALOG,
+            *self.get_personal_versions(),
+        ]
+        return self.conditional_response(
+            request, names, last_modified, get_response
+        )
 
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
@@ -147,11 +400,45 @@ class RecipeViewSet(ModelViewSet):
         data = {'user': user.id, 'recipe': recipe_id}
         serializer = add_serializer(data=data, context={'request': request})
         serializer.is_valid(raise_exception=True)
-        serializer.save()
+        recipe = serializer.validated_data['recipe']
+        if not add_user_recipes(model, user.id, [recipe.id]):
+            return response.Response(
+                {'detail': 'Рецепт уже добавлен!'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return response.Response(
+            RecipeShortSerializer(recipe, context={'request': request}).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    @staticmethod
+    def add_many_to(model, request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        recipes = get_objects_in_bulk(
+            Recipe.objects.all(), recipe_ids, 'recipes', 'Нет рецептов'
+        )
+        added = add_user_recipes(model, request.user.id, recipe_ids)
         return response.Response(
-            serializer.data, status=status.HTTP_201_CREATED
+            {
+                'added': added,
+                'recipes': RecipeShortSerializer(
+                    recipes, many=True, context={'request': request}
+                ).data,
+            },
+            status=status.HTTP_201_CREATED,
         )
 
+    @staticmethod
+    def remove_many_from(model, request):
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        removed = remove_user_recipes(
+            model, request.user.id, serializer.validated_data['recipes']
+        )
+        return response.Response({'removed': removed})
+
     @action(
         detail=True,
         methods=['post'],
@@ -162,9 +449,7 @@ class RecipeViewSet(ModelViewSet):
 
     @favorite.mapping.delete
     def delete_favorite(self, request, pk):
-        queryset = Favourite.objects.filter(user=request.user, recipe=pk)
-        if queryset.exists():
-            queryset.delete()
+        if remove_user_recipes(Favourite, request.user.id, [pk]):
             return response.Response(
                 {'detail': 'Рецепт успешно удалён из избранного!'},
                 status=status.HTTP_204_NO_CONTENT,
@@ -175,6 +460,20 @@ class RecipeViewSet(ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='favorite',
+        permission_classes=[IsAuthenticated],
+    )
+    def favorites(self, request):
+        """Добавить в избранное сразу несколько рецептов."""
+        return self.add_many_to(Favourite, request)
+
+    @favorites.mapping.delete
+    def delete_favorites(self, request):
+        return self.remove_many_from(Favourite, request)
+
     @action(
         detail=True,
         methods=['post'],
@@ -185,9 +484,7 @@ class RecipeViewSet(ModelViewSet):
 
     @shopping_cart.mapping.delete
     def delete_shopping_cart(self, request, pk):
-        queryset = ShoppingCart.objects.filter(user=request.user, recipe=pk)
-        if queryset.exists():
-            queryset.delete()
+        if remove_user_recipes(ShoppingCart, request.user.id, [pk]):
             return response.Response(
                 {'detail': 'Рецепт успешно удалён из корзины!'},
                 status=status.HTTP_204_NO_CONTENT,
@@ -198,35 +495,79 @@ class RecipeViewSet(ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='shopping_cart',
+        permission_classes=[IsAuthenticated],
+    )
+    def shopping_carts(self, request):
+        """Добавить в корзину сразу несколько рецептов."""
+        return self.add_many_to(ShoppingCart, request)
+
+    @shopping_carts.mapping.delete
+    def delete_shopping_carts(self, request):
+        return self.remove_many_from(ShoppingCart, request)
+
     @action(detail=False, permission_classes=[IsAuthenticated])
     def download_shopping_cart(self, request):
         user = request.user
-        if not user.shopping_cart.exists():
-            return Response(status=HTTP_400_BAD_REQUEST)
-
-        ingredients = (
-            IngredientInRecipe.objects.filter(
-                recipe__shopping_cart__user=request.user
-            )
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(amount=Sum('amount'))
+        renderer_class = SHOPPING_LIST_RENDERERS.get(
+            request.query_params.get('type', TextRenderer.extension)
         )
-
+        if renderer_class is None:
+            return Response(
+                {'type': list(SHOPPING_LIST_RENDERERS)},
+                status=HTTP_400_BAD_REQUEST,
+            )
         today = timezone.now()
-
-        shopping_list_buffer = create_shopping_list_buffer(
-            ingredients,
-            today.strftime('%Y-%m-%d'),
-            today.strftime('%Y'),
-            user.get_full_name(),
+        versions = get_versions(
+            (
+                CART_VERSION.format(user.id),
+                INGREDIENTS_CATALOG,
+                AUTHOR_VERSION.format(user.id),
+            )
         )
+        etag = make_etag(
+            'shopping-list',
+            user.id,
+            renderer_class.extension,
+            f'{today:%Y-%m-%d}',
+            *versions.values(),
+        )
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            response['ETag'] = etag
+            return response
+        ingredients = get_shopping_list(user)
+        if not ingredients:
+            return Response(status=HTTP_400_BAD_REQUEST)
 
-        filename = f'{user.username}_shopping_list.txt'
-
-        response = HttpResponse(
-            shopping_list_buffer.read(),
-            content_type='text/plain;charset=UTF-8',
+        renderer = renderer_class(ingredients, user, today)
+        filename = f'{user.username}_shopping_list.{renderer.extension}'
+        response = StreamingHttpResponse(
+            renderer.render(), content_type=renderer.content_type
         )
         response['Content-Disposition'] = f'attachment; filename={filename}'
+        response['ETag'] = etag
 
         return response
+
+
+class CacheStatsView(APIView):
+    """Счётчики кешей процесса, обслужившего запрос.
+
+    Кеши и их счётчики у каждого процесса свои, поэтому в ответе есть
+    pid: общая картина складывается из нескольких запросов.
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(
+            {
+                'pid': os.getpid(),
+                'responses': response_cache.stats(),
+                'tokens': token_cache.stats(),
+            }
+        )
@@ -0,0 +1,104 @@
+import pytest
+from django.core.cache import caches
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from users.models import User
+
+
+@pytest.fixture(autouse=True)
+def isolated_media_and_caches(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path / 'media')
+    # Общий каталог FileBasedCache не должен очищаться тестами.
+    settings.CACHES = {
+        **settings.CACHES,
+        'default': {
+            **settings.CACHES['default'],
+            'LOCATION': str(tmp_path / 'cache'),
+        },
+    }
+    settings.IMAGE_WORKERS = 0
+    settings.INGREDIENT_IMPORT_WORKERS = 0
+    for cache in caches.all():
+        cache.clear()
+
+
+@pytest.fixture
+def make_user(db):
+    def make_user(username):
+        return User.objects.create_user(
+            username=username,
+            email=f'{username}@example.com',
+            first_name='Имя',
+            last_name='Фамилия',
+            password='secret-password-123',
+        )
+
+    return make_user
+
+
+@pytest.fixture
+def user(make_user):
+    return make_user('user')
+
+
+@pytest.fixture
+def make_client():
+    def make_client(user):
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        return client
+
+    return make_client
+
+
+@pytest.fixture
+def client(make_client, user):
+    return make_client(user)
+
+
+@pytest.fixture
+def anonymous_client():
+    return APIClient()
+
+
+@pytest.fixture
+def tags(db):
+    return [
+        Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}', slug=f'tag{i}')
+        for i in range(3)
+    ]
+
+
+@pytest.fixture
+def ingredients(db):
+    return [
+        Ingredient.objects.create(name=name, measurement_unit='г')
+        for name in ('мука', 'сахар', 'соль', 'яйца')
+    ]
+
+
+@pytest.fixture
+def make_recipe(tags, ingredients):
+    def make_recipe(author, name='Рецепт', recipe_tags=None, amounts=None):
+        recipe = Recipe.objects.create(
+            author=author,
+            name=name,
+            image='recipes/image.png',
+            text='Описание',
+            cooking_time=10,
+        )
+        recipe.tags.set(tags if recipe_tags is None else recipe_tags)
+        if amounts is None:
+            amounts = {ingredient.id: 100 for ingredient in ingredients[:2]}
+        IngredientInRecipe.objects.bulk_create(
+            IngredientInRecipe(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+        )
+        return recipe
+
+    return make_recipe
@@ -0,0 +1,86 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'version:{}'
+
+
+def make_version():
+    """Новое значение версии.
+
+    Время исключает повтор прежних значений после вытеснения ключа, а
+    случайная часть — совпадение значений при одновременной смене версии
+    в разных процессах.
+    """
+    return time.time_ns() * 1000 + random.randrange(1000)
+
+
+def get_version(name):
+    """Текущая версия набора данных name.
+
+    Ключ версии живёт не дольше CACHE_VERSION_TIMEOUT: если смена версии
+    не дошла до процесса (например, кеш не общий), данные устаревают не
+    дольше этого срока.
+    """
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, make_version(), timeout=settings.CACHE_VERSION_TIMEOUT)
+        version = cache.get(key, make_version())
+    return version
+
+
+def bump_version(name):
+    """Сменить версию набора данных name.
+
+    Значение не увеличивается, а заменяется новым: у incr большинства
+    бэкендов чтение и запись не атомарны, и две одновременные смены
+    могли бы дать одно и то же значение.
+    """
+    version = make_version()
+    cache.set(
+        VERSION_KEY.format(name),
+        version,
+        timeout=settings.CACHE_VERSION_TIMEOUT,
+    )
+    return version
+
+
+def get_versions(names):
+    """Текущие версии наборов данных names одним чтением из кеша."""
+    keys = {name: VERSION_KEY.format(name) for name in names}
+    found = cache.get_many(keys.values())
+    return {
+        name: found[key] if key in found else get_version(name)
+        for name, key in keys.items()
+    }
+
+
+def bump_versions(names):
+    """Сменить версии нескольких наборов данных."""
+    for name in names:
+        bump_version(name)
+
+
+class VersionedStore:
+    """Данные в памяти процесса, действительные до смены версии."""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self._entry = (None, None)
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Вернуть пару (версия, данные), перезагрузив устаревшие."""
+        version = get_version(self.name)
+        entry = self._entry
+        if entry[0] != version:
+            with self._lock:
+                entry = self._entry
+                if entry[0] != version:
+                    entry = self._entry = (version, self.loader())
+        return entry
@@ -1 +1,14 @@
 FAVORITE_RECIPE_DELETE = 'Рецепт успешно удален из избраного'
+TAGS_CATALOG = 'tags'
+INGREDIENTS_CATALOG = 'ingredients'
+CART_VERSION = 'cart:{}'
+FAVORITES_VERSION = 'favorites:{}'
+RECIPES_LIST = 'recipes'
+RECIPES_POPULARITY = 'recipes-popularity'
+RECIPE_VERSION = 'recipe:{}'
+AUTHOR_VERSION = 'author:{}'
+TAG_VERSION = 'tag:{}'
+INGREDIENT_VERSION = 'ingredient:{}'
+AUTHORS = 'authors'
+SUBSCRIPTIONS_VERSION = 'subscriptions:{}'
+TOKEN_VERSION = 'token:{}'
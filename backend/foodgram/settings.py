@@ -1,5 +1,6 @@
 # flake8: noqa
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -24,6 +25,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # Third-Party Apps
     'rest_framework',
     'rest_framework.authtoken',
@@ -78,6 +80,43 @@ DATABASES = {
     }
 }
 
+# Версии наборов данных хранятся в кеше default, поэтому он должен быть
+# общим для веб-процессов и management-команд.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.filebased.FileBasedCache',
+        ),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            default=os.path.join(tempfile.gettempdir(), 'foodgram-cache'),
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', default=10000)),
+        },
+    },
+    'responses': {
+        'BACKEND': os.getenv(
+            'RESPONSE_CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.getenv(
+            'RESPONSE_CACHE_LOCATION', default='foodgram-responses'
+        ),
+        'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=300)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(
+                os.getenv('RESPONSE_CACHE_MAX_ENTRIES', default=1000)
+            ),
+        },
+    },
+}
+
+RESPONSE_CACHE = 'responses'
+
+CACHE_VERSION_TIMEOUT = int(os.getenv('CACHE_VERSION_TIMEOUT', default=300))
+
 AUTH_USER_MODEL = 'users.User'
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -100,7 +139,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ),
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -130,11 +169,53 @@ EMPTY = '-пусто-'
 
 DRF_PAGE_SIZE = 6
 
+RECIPES_BULK_LIMIT = 100
+
+TOKEN_CACHE_MAX_ENTRIES = int(
+    os.getenv('TOKEN_CACHE_MAX_ENTRIES', default=10000)
+)
+
+TOKEN_CACHE_TIMEOUT = int(os.getenv('TOKEN_CACHE_TIMEOUT', default=60))
+
+INGREDIENT_SEARCH_LIMIT = 20
+
+INGREDIENT_FUZZY_BACKEND = os.getenv(
+    'INGREDIENT_FUZZY_BACKEND', default='auto'
+)
+
+INGREDIENT_FUZZY_THRESHOLD = 0.3
+
+INGREDIENT_FUZZY_MAX_POSTINGS = 50000
+
+INGREDIENT_IMPORT_WORKERS = int(
+    os.getenv('INGREDIENT_IMPORT_WORKERS', default=1)
+)
+
+INGREDIENT_IMPORT_BATCH_SIZE = 1000
+
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.getenv('RECIPE_IMAGE_MAX_SIZE', default=5 * 1024 * 1024)
+)
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', default=2))
+
+IMAGE_VARIANT_WIDTHS = (320, 640, 1280)
+
+IMAGE_VARIANT_FORMATS = ('webp', 'avif')
+
+IMAGE_VARIANT_QUALITY = 80
+
+IMAGE_SRCSET_FORMAT = 'webp'
+
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'collected_static'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/media'
 
+DEFAULT_FILE_STORAGE = 'foodgram.storage.ContentAddressedStorage'
+
+MEDIA_GC_MIN_AGE = 60 * 60
+
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -0,0 +1,48 @@
+import hashlib
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, именующее файлы по хешу содержимого.
+
+    Файл сохраняется как <каталог>/<xx>/<sha256><расширение>, где
+    каталог берётся из upload_to, а xx — первые символы хеша. Файл с
+    тем же содержимым уже лежит под этим именем, поэтому повторная
+    загрузка ничего не пишет. Файлы могут быть общими для нескольких
+    записей, так что удаляются они только командой collect_media.
+    """
+
+    def get_content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        extension = os.path.splitext(filename)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.get_content_name(name, content)
+        if self.exists(name):
+            # Свежее время изменения защищает файл от collect_media,
+            # пока новая запись на него ещё не сохранена.
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+def iter_files(storage, path=''):
+    """Имена всех файлов хранилища, каталог за каталогом."""
+    directories, files = storage.listdir(path)
+    for filename in files:
+        yield posixpath.join(path, filename)
+    for directory in directories:
+        yield from iter_files(storage, posixpath.join(path, directory))
@@ -0,0 +1,40 @@
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+
+from foodgram.cache import bump_version, get_version
+
+
+def test_version_bumped_in_another_process_is_visible():
+    before = get_version('ingredients')
+    subprocess.run(
+        [
+            sys.executable,
+            str(settings.BASE_DIR / 'manage.py'),
+            'shell',
+            '-c',
+            'from foodgram.cache import bump_version; '
+            'bump_version("ingredients")',
+        ],
+        check=True,
+        env={
+            **os.environ,
+            'CACHE_LOCATION': settings.CACHES['default']['LOCATION'],
+        },
+    )
+    assert get_version('ingredients') != before
+
+
+def test_bump_always_changes_version():
+    versions = {get_version('tags')}
+    for _ in range(100):
+        versions.add(bump_version('tags'))
+    assert len(versions) == 101
+
+
+def test_version_keys_expire(settings):
+    settings.CACHE_VERSION_TIMEOUT = 0
+    first = get_version('authors')
+    assert get_version('authors') != first
@@ -1,14 +1,14 @@
-import csv
+from collections import Counter, defaultdict
 
 from django.contrib import admin, messages
 from django.contrib.auth.models import Group
-from django.db.models import Count
-from django.http import HttpResponseRedirect
-from django.shortcuts import render
+from django.http import HttpResponseRedirect, JsonResponse
+from django.shortcuts import get_object_or_404, render
 from django.urls import path, reverse
 from rest_framework.authtoken.models import TokenProxy
 
 from .forms import IngredientImportForm
+from .jobs import schedule_import
 from .models import (
     Favourite,
     ImportIngredient,
@@ -16,8 +16,14 @@ from .models import (
     IngredientInRecipe,
     Recipe,
     ShoppingCart,
+    ShoppingCartIngredient,
     Tag,
 )
+from .services import (
+    add_user_recipes,
+    remove_user_recipes,
+    update_recipe_ingredients,
+)
 
 
 @admin.register(Ingredient)
@@ -28,34 +34,59 @@ class IngredientAdmin(admin.ModelAdmin):
 
     def get_urls(self):
         urls = super().get_urls()
-        urls.insert(-1, path('csv-upload/', self.upload_csv))
+        urls[-1:-1] = [
+            path(
+                'csv-upload/',
+                self.admin_site.admin_view(self.upload_csv),
+                name='recipes_ingredient_upload',
+            ),
+            path(
+                'csv-upload/<int:pk>/',
+                self.admin_site.admin_view(self.upload_status),
+                name='recipes_ingredient_upload_status',
+            ),
+        ]
         return urls
 
     def upload_csv(self, request):
+        """Сохранить файл и поставить его импорт в очередь."""
         if request.method == 'POST':
             form = IngredientImportForm(request.POST, request.FILES)
             if form.is_valid():
-                form_object = form.save()
-                with open(
-                    form_object.csv_file.path, encoding='utf-8'
-                ) as csv_file:
-                    rows = csv.reader(csv_file, delimiter=',')
-                    if next(rows) != ['name', 'measurement_unit']:
-                        messages.warning(request, 'Неверные заголовки у файла')
-                        return HttpResponseRedirect(request.path_info)
-                    Ingredient.objects.bulk_create(
-                        Ingredient(
-                            name=row[0],
-                            measurement_unit=row[1],
-                        )
-                        for row in rows
+                job = form.save()
+                schedule_import(job)
+                messages.info(request, 'Файл поставлен в очередь на импорт')
+                return HttpResponseRedirect(
+                    reverse(
+                        'admin:recipes_ingredient_upload_status',
+                        args=(job.pk,),
                     )
-                url = reverse('admin:index')
-                messages.success(request, 'Файл успешно импортирован')
-                return HttpResponseRedirect(url)
-        form = IngredientImportForm()
+                )
+        else:
+            form = IngredientImportForm()
         return render(request, 'admin/csv_import_page.html', {'form': form})
 
+    def upload_status(self, request, pk):
+        """Состояние задания импорта: страница или JSON для опроса."""
+        job = get_object_or_404(ImportIngredient, pk=pk)
+        status = {
+            'status': job.status,
+            'status_display': job.get_status_display(),
+            'finished': job.is_finished,
+            'processed': job.processed,
+            'created': job.created,
+            'duplicates': job.duplicates,
+            'errors': job.errors,
+            'message': job.message,
+        }
+        if request.GET.get('format') == 'json':
+            return JsonResponse(status)
+        return render(
+            request,
+            'admin/csv_import_status.html',
+            {'job': job, 'status': status},
+        )
+
 
 class IngredientInRecipeInline(admin.TabularInline):
     model = IngredientInRecipe
@@ -75,8 +106,27 @@ class TagAdmin(admin.ModelAdmin):
 
 
 @admin.register(ImportIngredient)
-class ImportIngredient(admin.ModelAdmin):
-    list_display = ('csv_file', 'date_added')
+class ImportIngredientAdmin(admin.ModelAdmin):
+    list_display = (
+        'csv_file',
+        'date_added',
+        'status',
+        'processed',
+        'created',
+        'duplicates',
+        'errors',
+    )
+    list_filter = ('status',)
+    readonly_fields = (
+        'status',
+        'processed',
+        'created',
+        'duplicates',
+        'errors',
+        'message',
+        'started_at',
+        'finished_at',
+    )
 
 
 @admin.register(Recipe)
@@ -96,22 +146,56 @@ class RecipeAdmin(admin.ModelAdmin):
             .get_queryset(request)
             .select_related('author')
             .prefetch_related('tags')
-            .annotate(favorites_count=Count('favorites'))
         )
         return queryset
 
-    @admin.display(description='Количество в избранных')
+    def save_formset(self, request, form, formset, change):
+        """Состав рецепта меняется через сервис, как и в API.
+
+        Так изменения попадают в списки покупок пользователей, у которых
+        рецепт в корзине.
+        """
+        if formset.model is not IngredientInRecipe:
+            return super().save_formset(request, form, formset, change)
+        # Без записи: заполняет new_objects и прочие поля для журнала.
+        formset.save(commit=False)
+        amounts = Counter()
+        for item_form in formset.forms:
+            data = item_form.cleaned_data
+            if data.get('ingredient') and not data.get('DELETE'):
+                amounts[data['ingredient'].id] += data['amount']
+        update_recipe_ingredients(form.instance, amounts)
+
+    @admin.display(
+        description='Количество в избранных', ordering='favorites_count'
+    )
     def added_in_favorites(self, obj):
         return obj.favorites_count
 
 
 @admin.register(IngredientInRecipe)
 class RecipeIngredientAdmin(admin.ModelAdmin):
+    """Только просмотр: состав меняется на странице рецепта."""
+
     list_display = ('pk', 'recipe', 'ingredient', 'amount')
 
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class UserRecipesAdmin(admin.ModelAdmin):
+    """Записи избранного и корзин меняются через сервисы.
+
+    Сервисы обновляют счётчики рецептов, списки покупок и версии
+    кешей. Существующую запись можно только удалить.
+    """
 
-@admin.register(Favourite)
-class FavoriteAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'recipe')
 
     def get_queryset(self, request):
@@ -125,21 +209,42 @@ class FavoriteAdmin(admin.ModelAdmin):
             )
         )
 
+    def get_readonly_fields(self, request, obj=None):
+        return ('user', 'recipe') if obj is not None else ()
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            return
+        add_user_recipes(self.model, obj.user_id, [obj.recipe_id])
+        obj.pk = self.model.objects.values_list('pk', flat=True).get(
+            user_id=obj.user_id, recipe_id=obj.recipe_id
+        )
+
+    def delete_model(self, request, obj):
+        remove_user_recipes(self.model, obj.user_id, [obj.recipe_id])
+
+    def delete_queryset(self, request, queryset):
+        recipes = defaultdict(list)
+        for user_id, recipe_id in queryset.values_list('user_id', 'recipe_id'):
+            recipes[user_id].append(recipe_id)
+        for user_id, recipe_ids in recipes.items():
+            remove_user_recipes(self.model, user_id, recipe_ids)
+
+
+@admin.register(Favourite)
+class FavoriteAdmin(UserRecipesAdmin):
+    pass
+
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'user', 'recipe')
+class ShoppingCartAdmin(UserRecipesAdmin):
+    pass
 
-    def get_queryset(self, request):
-        return (
-            super()
-            .get_queryset(request)
-            .select_related('user')
-            .prefetch_related(
-                'recipe__ingredients',
-                'recipe__tags',
-            )
-        )
+
+@admin.register(ShoppingCartIngredient)
+class ShoppingCartIngredientAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'user', 'ingredient', 'amount')
+    list_select_related = ('user', 'ingredient')
 
 
 admin.site.unregister(Group)
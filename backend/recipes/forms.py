@@ -1,5 +1,7 @@
+from django.core.exceptions import ValidationError
 from django.forms import ModelForm
 
+from .importers import get_reader
 from .models import ImportIngredient
 
 
@@ -9,3 +11,11 @@ class IngredientImportForm(ModelForm):
     class Meta:
         model = ImportIngredient
         fields = ('csv_file',)
+
+    def clean_csv_file(self):
+        csv_file = self.cleaned_data['csv_file']
+        try:
+            get_reader(csv_file.name)
+        except ValueError as error:
+            raise ValidationError(str(error))
+        return csv_file
@@ -0,0 +1,165 @@
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image
+
+from foodgram.cache import bump_version
+from foodgram.constants import RECIPE_VERSION
+
+from .models import Recipe
+
+VARIANTS_DIR = 'recipes/variants'
+
+PIL_FORMATS = {'webp': 'WEBP', 'avif': 'AVIF', 'jpeg': 'JPEG'}
+
+executor = None
+
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_WORKERS,
+            thread_name_prefix='recipe-images',
+        )
+    return executor
+
+
+def get_formats():
+    """Форматы из IMAGE_VARIANT_FORMATS, которые умеет сохранять Pillow."""
+    Image.init()
+    return [
+        extension
+        for extension in settings.IMAGE_VARIANT_FORMATS
+        if PIL_FORMATS[extension] in Image.SAVE
+    ]
+
+
+def get_variant_name(source, width, extension):
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return f'{VARIANTS_DIR}/{stem}-{width}.{extension}'
+
+
+def make_variants(source, file):
+    """Сохранить уменьшенные копии изображения во всех форматах.
+
+    Изображение не увеличивается: если оно уже самой маленькой
+    ширины, сохраняется одна копия исходного размера.
+    """
+    with Image.open(file) as image:
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert(
+            'RGBA' if 'transparency' in image.info else 'RGB'
+        )
+    widths = [
+        width
+        for width in sorted(settings.IMAGE_VARIANT_WIDTHS)
+        if width < image.width
+    ] or [image.width]
+    variants = []
+    for width in widths:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        for extension in get_formats():
+            if extension == 'jpeg' and resized.mode != 'RGB':
+                resized = resized.convert('RGB')
+            buffer = io.BytesIO()
+            resized.save(
+                buffer,
+                PIL_FORMATS[extension],
+                quality=settings.IMAGE_VARIANT_QUALITY,
+            )
+            name = default_storage.save(
+                get_variant_name(source, width, extension),
+                ContentFile(buffer.getvalue()),
+            )
+            variants.append(
+                {'width': width, 'format': extension, 'name': name}
+            )
+    return variants
+
+
+def has_actual_variants(recipe):
+    return bool(recipe.image) and (
+        recipe.image_variants.get('source') == recipe.image.name
+    )
+
+
+def find_variants(source):
+    """Готовые копии изображения source у любого рецепта."""
+    for image_variants in Recipe.objects.filter(image=source).values_list(
+        'image_variants', flat=True
+    ):
+        if image_variants.get('source') == source:
+            return image_variants
+    return None
+
+
+def build_variants(source):
+    """Построить копии изображения source.
+
+    Не обращается к базе данных, поэтому может выполняться в отдельном
+    процессе.
+    """
+    with default_storage.open(source, 'rb') as file:
+        return {'source': source, 'variants': make_variants(source, file)}
+
+
+def save_variants(recipe_id, image_variants):
+    """Записать копии, если изображение рецепта с тех пор не сменилось."""
+    if not Recipe.objects.filter(
+        pk=recipe_id, image=image_variants['source']
+    ).update(image_variants=image_variants, updated_at=timezone.now()):
+        return False
+    bump_version(RECIPE_VERSION.format(recipe_id))
+    return True
+
+
+def process_image(recipe_id, force=False):
+    """Построить копии изображения рецепта, если они устарели.
+
+    Файлы именуются по содержимому, поэтому копии того же изображения
+    у другого рецепта переиспользуются без обработки. Результат
+    записывается, только если за время обработки изображение рецепта не
+    сменилось; лишние файлы удаляет команда collect_media. Возвращает
+    признак того, что копии обновлены.
+    """
+    recipe = (
+        Recipe.objects.filter(pk=recipe_id)
+        .only('id', 'image', 'image_variants')
+        .first()
+    )
+    if recipe is None or not recipe.image:
+        return False
+    if has_actual_variants(recipe) and not force:
+        return False
+    source = recipe.image.name
+    image_variants = None if force else find_variants(source)
+    if image_variants is None:
+        image_variants = build_variants(source)
+    return save_variants(recipe_id, image_variants)
+
+
+def run_image(recipe_id):
+    try:
+        process_image(recipe_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_image(recipe):
+    """Отдать обработку изображения пулу потоков после фиксации.
+
+    При IMAGE_WORKERS = 0 копии строит команда build_image_variants.
+    """
+    if settings.IMAGE_WORKERS:
+        transaction.on_commit(
+            lambda: get_executor().submit(run_image, recipe.pk)
+        )
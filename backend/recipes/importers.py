@@ -0,0 +1,133 @@
+import csv
+import json
+import os
+import time
+
+from django.db import transaction
+
+from .models import Ingredient
+
+FIELDS = ('name', 'measurement_unit')
+MAX_LENGTH = 200
+
+
+def read_csv(file):
+    """Строки CSV-файла с заголовком name,measurement_unit."""
+    reader = csv.DictReader(file)
+    if tuple(reader.fieldnames or ()) != FIELDS:
+        raise ValueError('Неверные заголовки у файла')
+    yield from reader
+
+
+def read_json(file):
+    """Записи JSON-массива объектов с полями name и measurement_unit."""
+    rows = json.load(file)
+    if not isinstance(rows, list):
+        raise ValueError('Ожидается JSON-массив ингредиентов')
+    yield from rows
+
+
+READERS = {'csv': read_csv, 'json': read_json}
+
+
+def get_reader(path, file_format=None):
+    """Функция чтения по явному формату или расширению файла."""
+    file_format = file_format or os.path.splitext(path)[1].lstrip('.')
+    try:
+        return READERS[file_format.lower()]
+    except KeyError:
+        raise ValueError(f'Неизвестный формат файла: {file_format}')
+
+
+class IngredientImporter:
+    """Пакетная загрузка ингредиентов без дублей.
+
+    Строки читаются потоком, повторы внутри файла отбрасываются по паре
+    (название, единица измерения), а совпадения с уже существующими
+    записями пропускает уникальное ограничение базы данных.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.seen = set()
+        self.total = 0
+        self.duplicates = 0
+        self.errors = 0
+        self.created = 0
+        self.elapsed = 0
+
+    def clean(self, row):
+        try:
+            name = str(row['name']).strip()
+            measurement_unit = str(row['measurement_unit']).strip()
+        except (KeyError, TypeError):
+            return None
+        if not name or not measurement_unit:
+            return None
+        if len(name) > MAX_LENGTH or len(measurement_unit) > MAX_LENGTH:
+            return None
+        return name, measurement_unit
+
+    def batches(self, rows):
+        batch = []
+        for row in rows:
+            self.total += 1
+            key = self.clean(row)
+            if key is None:
+                self.errors += 1
+                continue
+            if key in self.seen:
+                self.duplicates += 1
+                continue
+            self.seen.add(key)
+            batch.append(Ingredient(name=key[0], measurement_unit=key[1]))
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def load_existing(self):
+        """Считать уже загруженные ингредиенты дублями."""
+        self.seen.update(
+            Ingredient.objects.values_list(
+                'name', 'measurement_unit'
+            ).iterator(chunk_size=self.batch_size * 10)
+        )
+
+    def write(self, batch):
+        Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def run(self, rows):
+        """Загрузить все строки в одной транзакции."""
+        started = time.perf_counter()
+        with transaction.atomic():
+            before = Ingredient.objects.count()
+            for batch in self.batches(rows):
+                self.write(batch)
+            self.created = Ingredient.objects.count() - before
+        self.duplicates = self.total - self.errors - self.created
+        self.elapsed = time.perf_counter() - started
+        return self
+
+    def run_in_batches(self, rows, callback=None):
+        """Загрузить строки, фиксируя каждую пачку отдельно.
+
+        Существующие ингредиенты считаются дублями заранее, поэтому
+        созданными считаются все записанные строки. После каждой пачки
+        вызывается callback(importer).
+        """
+        started = time.perf_counter()
+        self.load_existing()
+        for batch in self.batches(rows):
+            with transaction.atomic():
+                self.write(batch)
+            self.created += len(batch)
+            if callback is not None:
+                callback(self)
+        self.elapsed = time.perf_counter() - started
+        return self
+
+    @property
+    def rate(self):
+        return self.total / self.elapsed if self.elapsed else 0
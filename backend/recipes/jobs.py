@@ -0,0 +1,93 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from foodgram.cache import bump_version
+from foodgram.constants import INGREDIENTS_CATALOG
+
+from .importers import IngredientImporter, get_reader
+from .models import ImportIngredient
+
+executor = None
+
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.INGREDIENT_IMPORT_WORKERS,
+            thread_name_prefix='ingredient-import',
+        )
+    return executor
+
+
+def claim_import(job_id):
+    """Перевести задание в обработку, если его ещё никто не взял."""
+    return ImportIngredient.objects.filter(
+        pk=job_id, status=ImportIngredient.PENDING
+    ).update(status=ImportIngredient.PROCESSING, started_at=timezone.now())
+
+
+def save_progress(job_id, importer, **fields):
+    ImportIngredient.objects.filter(pk=job_id).update(
+        processed=importer.total,
+        created=importer.created,
+        duplicates=importer.duplicates,
+        errors=importer.errors,
+        **fields,
+    )
+
+
+def process_import(job_id):
+    """Загрузить файл задания импорта пачками с учётом прогресса."""
+    if not claim_import(job_id):
+        return
+    job = ImportIngredient.objects.get(pk=job_id)
+    importer = IngredientImporter(settings.INGREDIENT_IMPORT_BATCH_SIZE)
+    try:
+        reader = get_reader(job.csv_file.name)
+        with job.csv_file.open('rb') as file:
+            importer.run_in_batches(
+                reader(io.TextIOWrapper(file, encoding='utf-8')),
+                callback=lambda importer: save_progress(job_id, importer),
+            )
+    except Exception as error:
+        save_progress(
+            job_id,
+            importer,
+            status=ImportIngredient.FAILED,
+            message=str(error),
+            finished_at=timezone.now(),
+        )
+    else:
+        save_progress(
+            job_id,
+            importer,
+            status=ImportIngredient.DONE,
+            finished_at=timezone.now(),
+        )
+    finally:
+        if importer.created:
+            bump_version(INGREDIENTS_CATALOG)
+
+
+def run_import(job_id):
+    try:
+        process_import(job_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_import(job):
+    """Отдать задание пулу потоков после фиксации транзакции.
+
+    При INGREDIENT_IMPORT_WORKERS = 0 задания остаются в очереди для
+    команды process_imports.
+    """
+    if settings.INGREDIENT_IMPORT_WORKERS:
+        transaction.on_commit(
+            lambda: get_executor().submit(run_import, job.pk)
+        )
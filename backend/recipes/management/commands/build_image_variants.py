@@ -0,0 +1,158 @@
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.images import build_variants, has_actual_variants, save_variants
+from recipes.models import Recipe
+
+
+class InlineExecutor:
+    """Выполнение задач в текущем процессе для --workers 0."""
+
+    def submit(self, function, *args):
+        return InlineResult(function, *args)
+
+    def shutdown(self, wait=True):
+        pass
+
+
+class InlineResult:
+    def __init__(self, function, *args):
+        self.function = function
+        self.args = args
+
+    def result(self):
+        return self.function(*self.args)
+
+
+class Command(BaseCommand):
+    help = 'Построение уменьшенных копий изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Пересоздать копии и для рецептов, у которых они есть',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать рецепты, которые нужно обработать',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Число процессов; 0 — обработка в текущем процессе',
+        )
+        parser.add_argument('--chunk-size', type=int, default=200)
+        parser.add_argument(
+            '--checkpoint',
+            help=(
+                'Файл с id последнего обработанного рецепта: при запуске '
+                'обработка продолжается после него, по завершении файл '
+                'удаляется'
+            ),
+        )
+
+    def read_checkpoint(self, path):
+        if not path or not os.path.exists(path):
+            return 0
+        with open(path) as file:
+            try:
+                return int(file.read().strip() or 0)
+            except ValueError:
+                raise CommandError(f'Некорректный файл {path}')
+
+    def write_checkpoint(self, path, recipe_id):
+        if not path:
+            return
+        with open(f'{path}.tmp', 'w') as file:
+            file.write(str(recipe_id))
+        os.replace(f'{path}.tmp', path)
+
+    def get_executor(self, workers):
+        if not workers:
+            return InlineExecutor()
+        # Дочерние процессы не наследуют соединение с базой данных.
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+
+    def process_chunk(self, executor, recipes):
+        """Построить копии каждого изображения пачки один раз.
+
+        Возвращает число построенных изображений, сохранённых рецептов и
+        ошибок.
+        """
+        futures = {
+            source: executor.submit(build_variants, source)
+            for source in dict.fromkeys(
+                recipe.image.name for recipe in recipes
+            )
+        }
+        results = {}
+        for source, future in futures.items():
+            try:
+                results[source] = future.result()
+            except Exception as error:
+                self.stderr.write(f'{source}: {error}')
+        saved = sum(
+            save_variants(recipe.id, results[recipe.image.name])
+            for recipe in recipes
+            if recipe.image.name in results
+        )
+        return len(results), saved, len(futures) - len(results)
+
+    def handle(self, *args, **options):
+        path = options['checkpoint']
+        start = self.read_checkpoint(path)
+        if start:
+            self.stdout.write(f'Продолжение после рецепта {start}')
+        recipes = (
+            recipe
+            for recipe in Recipe.objects.filter(id__gt=start)
+            .exclude(image='')
+            .only('id', 'image', 'image_variants')
+            .order_by('id')
+            .iterator(chunk_size=options['chunk_size'])
+            if options['force'] or not has_actual_variants(recipe)
+        )
+        if options['dry_run']:
+            count = sum(1 for _ in recipes)
+            self.stdout.write(f'Рецептов к обработке: {count}')
+            return
+        executor = self.get_executor(options['workers'])
+        built = saved = failed = 0
+        started = time.monotonic()
+        try:
+            while True:
+                chunk = list(islice(recipes, options['chunk_size']))
+                if not chunk:
+                    break
+                counters = self.process_chunk(executor, chunk)
+                built += counters[0]
+                saved += counters[1]
+                failed += counters[2]
+                self.write_checkpoint(path, chunk[-1].id)
+                self.stdout.write(
+                    f'Рецепт {chunk[-1].id}: изображений {built}, '
+                    f'{built / (time.monotonic() - started):.1f} в секунду'
+                )
+        finally:
+            executor.shutdown(wait=True)
+        if path and os.path.exists(path):
+            os.remove(path)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'Обработано изображений: {built}, рецептов: {saved}, '
+            f'ошибок: {failed}, {elapsed:.1f} с, '
+            f'{built / elapsed if elapsed else 0:.1f} изображений в секунду'
+        )
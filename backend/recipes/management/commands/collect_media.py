@@ -0,0 +1,116 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import islice
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.utils import timezone
+
+from foodgram.storage import iter_files
+from recipes.models import Recipe
+
+
+def get_referenced_files():
+    """Имена файлов, на которые ссылаются записи базы данных."""
+    names = set()
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                names.update(
+                    model._default_manager.exclude(**{field.name: ''})
+                    .exclude(**{f'{field.name}__isnull': True})
+                    .values_list(field.name, flat=True)
+                    .iterator()
+                )
+    for image_variants in Recipe.objects.values_list(
+        'image_variants', flat=True
+    ).iterator():
+        names.update(
+            variant['name'] for variant in image_variants.get('variants', ())
+        )
+    return names
+
+
+def get_still_referenced(names, changed_since):
+    """Имена из names, на которые сослались после changed_since.
+
+    Для полей-файлов проверяются сами имена, для копий изображений —
+    рецепты, изменённые с тех пор: save_variants обновляет updated_at.
+    """
+    found = set()
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                found.update(
+                    model._default_manager.filter(
+                        **{f'{field.name}__in': names}
+                    ).values_list(field.name, flat=True)
+                )
+    for image_variants in Recipe.objects.filter(
+        updated_at__gte=changed_since
+    ).values_list('image_variants', flat=True):
+        found.update(
+            variant['name']
+            for variant in image_variants.get('variants', ())
+            if variant['name'] in names
+        )
+    return found
+
+
+class Command(BaseCommand):
+    help = 'Поиск и удаление файлов MEDIA_ROOT, на которые нет ссылок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать файлы без ссылок',
+        )
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=settings.MEDIA_GC_MIN_AGE,
+            help='Не трогать файлы моложе указанного числа секунд',
+        )
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def iter_orphans(self, referenced, min_age):
+        created_before = timezone.now() - timedelta(seconds=min_age)
+        for name in iter_files(default_storage):
+            if name in referenced:
+                continue
+            if default_storage.get_modified_time(name) > created_before:
+                continue
+            yield name
+
+    def handle(self, *args, **options):
+        started = timezone.now()
+        referenced = get_referenced_files()
+        orphans = self.iter_orphans(referenced, options['min_age'])
+        found = size = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                batch = list(islice(orphans, options['batch_size']))
+                if not batch:
+                    break
+                # Пока шёл обход, новые записи могли сослаться на файлы.
+                still_referenced = get_still_referenced(set(batch), started)
+                batch = [
+                    name for name in batch if name not in still_referenced
+                ]
+                found += len(batch)
+                size += sum(executor.map(default_storage.size, batch))
+                if options['verbosity'] > 1:
+                    for name in batch:
+                        self.stdout.write(name)
+                if not options['dry_run']:
+                    list(executor.map(default_storage.delete, batch))
+        action = 'Найдено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(
+            f'Файлов со ссылками: {len(referenced)}. '
+            f'{action} файлов без ссылок: {found}, {size} байт'
+        )
@@ -1,21 +1,37 @@
-import csv
+from django.core.management.base import BaseCommand, CommandError
 
-from django.core.management.base import BaseCommand
-
-from recipes.models import Ingredient
+from foodgram.cache import bump_version
+from foodgram.constants import INGREDIENTS_CATALOG
+from recipes.importers import READERS, IngredientImporter, get_reader
 
 
 class Command(BaseCommand):
-    help = 'Импорт данных из CSV файла в базу данных'
+    help = 'Импорт ингредиентов из CSV или JSON файла в базу данных'
 
     def add_arguments(self, parser):
         parser.add_argument(
             'csv_file', type=str, help='backend/recipes/data/ingredients.csv'
         )
+        parser.add_argument(
+            '--format',
+            choices=tuple(READERS),
+            help='Формат файла, по умолчанию определяется по расширению',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
 
     def handle(self, *args, **options):
-        csv_file = options['csv_file']
-        with open(csv_file, 'r', encoding='utf-8') as file:
-            csv_reader = csv.DictReader(file)
-            for row in csv_reader:
-                Ingredient.objects.create(**row)
+        path = options['csv_file']
+        try:
+            reader = get_reader(path, options['format'])
+            with open(path, 'r', encoding='utf-8') as file:
+                importer = IngredientImporter(options['batch_size']).run(
+                    reader(file)
+                )
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        bump_version(INGREDIENTS_CATALOG)
+        self.stdout.write(
+            f'Строк: {importer.total}, добавлено: {importer.created}, '
+            f'дублей: {importer.duplicates}, ошибок: {importer.errors}, '
+            f'{importer.elapsed:.2f} с ({importer.rate:.0f} строк/с)'
+        )
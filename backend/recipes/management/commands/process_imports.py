@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.jobs import process_import
+from recipes.models import ImportIngredient
+
+
+class Command(BaseCommand):
+    help = 'Обработка заданий импорта ингредиентов из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Не завершаться, а ждать новые задания',
+        )
+        parser.add_argument('--interval', type=float, default=5)
+        parser.add_argument(
+            '--requeue',
+            action='store_true',
+            help='Вернуть в очередь задания, прерванные во время обработки',
+        )
+
+    def handle(self, *args, **options):
+        if options['requeue']:
+            requeued = ImportIngredient.objects.filter(
+                status=ImportIngredient.PROCESSING
+            ).update(status=ImportIngredient.PENDING)
+            self.stdout.write(f'Возвращено в очередь: {requeued}')
+        while True:
+            job_ids = list(
+                ImportIngredient.objects.filter(
+                    status=ImportIngredient.PENDING
+                )
+                .order_by('date_added')
+                .values_list('id', flat=True)
+            )
+            for job_id in job_ids:
+                process_import(job_id)
+                job = ImportIngredient.objects.get(pk=job_id)
+                self.stdout.write(
+                    f'{job}: строк {job.processed}, добавлено {job.created}, '
+                    f'дублей {job.duplicates}, ошибок {job.errors}'
+                )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
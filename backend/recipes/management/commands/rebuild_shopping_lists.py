@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from foodgram.cache import bump_version
+from foodgram.constants import CART_VERSION
+from recipes.models import ShoppingCartIngredient
+from recipes.services import rebuild_shopping_lists
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт списков покупок по содержимому корзин'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user_ids = set(
+            ShoppingCartIngredient.objects.values_list('user_id', flat=True)
+        )
+        rows = rebuild_shopping_lists(options['batch_size'])
+        user_ids.update(
+            ShoppingCartIngredient.objects.values_list('user_id', flat=True)
+        )
+        for user_id in user_ids:
+            bump_version(CART_VERSION.format(user_id))
+        self.stdout.write(f'Пересчитано строк списков покупок: {rows}')
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from recipes.services import reconcile_recipe_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт счётчиков избранного и корзин у рецептов'
+
+    def handle(self, *args, **options):
+        updated = reconcile_recipe_counters()
+        self.stdout.write(f'Обновлено рецептов: {updated}')
@@ -0,0 +1,53 @@
+# Generated by Django 3.2.15 on 2026-10-18 02:26
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    counters = {
+        'favorites_count': apps.get_model('recipes', 'Favourite'),
+        'in_carts_count': apps.get_model('recipes', 'ShoppingCart'),
+    }
+    Recipe.objects.update(
+        **{
+            field: Coalesce(
+                Subquery(
+                    model.objects.filter(recipe=OuterRef('pk'))
+                    .order_by()
+                    .values('recipe')
+                    .annotate(total=Count('id'))
+                    .values('total')
+                ),
+                0,
+            )
+            for field, model in counters.items()
+        }
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_shoppingcartingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество в избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество в корзинах'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-pub_date', '-id'], name='recipe_popularity_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
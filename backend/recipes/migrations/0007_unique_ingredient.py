@@ -0,0 +1,82 @@
+# Generated by Django 3.2.15 on 2026-10-18 02:27
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_recipe_items(IngredientInRecipe, keep, duplicates):
+    """Перевести строки рецептов на keep, сложив количества.
+
+    В одном рецепте могли быть и оставляемый ингредиент, и его дубликат:
+    такие строки сливаются в одну.
+    """
+    kept = {}
+    for item in IngredientInRecipe.objects.filter(
+        ingredient_id__in=[keep, *duplicates]
+    ).order_by('recipe_id', 'id'):
+        first = kept.setdefault(item.recipe_id, item)
+        if first is not item:
+            first.amount += item.amount
+            item.delete()
+    for item in kept.values():
+        item.ingredient_id = keep
+        item.save(update_fields=['ingredient', 'amount'])
+
+
+def merge_duplicates(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    ShoppingCartIngredient = apps.get_model(
+        'recipes', 'ShoppingCartIngredient'
+    )
+    groups = (
+        Ingredient.objects.values('name', 'measurement_unit')
+        .annotate(keep=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+        .order_by()
+    )
+    for group in groups:
+        duplicates = list(
+            Ingredient.objects.filter(
+                name=group['name'], measurement_unit=group['measurement_unit']
+            )
+            .exclude(id=group['keep'])
+            .values_list('id', flat=True)
+        )
+        merge_recipe_items(
+            IngredientInRecipe, group['keep'], duplicates
+        )
+        for item in ShoppingCartIngredient.objects.filter(
+            ingredient_id__in=duplicates
+        ):
+            kept, created = ShoppingCartIngredient.objects.get_or_create(
+                user_id=item.user_id,
+                ingredient_id=group['keep'],
+                defaults={'amount': 0},
+            )
+            kept.amount += item.amount
+            kept.save()
+            item.delete()
+        Ingredient.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+    # На PostgreSQL удаление строк оставляет отложенные проверки внешних
+    # ключей, и ALTER TABLE в той же транзакции завершается ошибкой
+    # "pending trigger events". Поэтому перенос данных выполняется в
+    # своей транзакции, а ограничение добавляется после её фиксации.
+    atomic = False
+
+    dependencies = [
+        ('recipes', '0006_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicates, migrations.RunPython.noop, atomic=True
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 3.2.15 on 2026-10-18 02:30
+
+from django.db import migrations, models
+
+
+def finish_previous_imports(apps, schema_editor):
+    ImportIngredient = apps.get_model('recipes', 'ImportIngredient')
+    ImportIngredient.objects.update(status='done')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_unique_ingredient'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='importingredient',
+            options={'ordering': ('-date_added',), 'verbose_name': 'Импорт ингредиентов', 'verbose_name_plural': 'Импорт ингредиентов'},
+        ),
+        migrations.AddField(
+            model_name='importingredient',
+            name='created',
+            field=models.PositiveIntegerField(default=0, verbose_name='Добавлено'),
+        ),
+        migrations.AddField(
+            model_name='importingredient',
+            name='duplicates',
+            field=models.PositiveIntegerField(default=0, verbose_name='Дублей'),
+        ),
+        migrations.AddField(
+            model_name='importingredient',
+            name='errors',
+            field=models.PositiveIntegerField(default=0, verbose_name='Ошибок'),
+        ),
+        migrations.AddField(
+            model_name='importingredient',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Окончание'),
+        ),
+        migrations.AddField(
+            model_name='importingredient',
+            name='message',
+            field=models.TextField(blank=True, verbose_name='Сообщение'),
+        ),
+        migrations.AddField(
+            model_name='importingredient',
+            name='processed',
+            field=models.PositiveIntegerField(default=0, verbose_name='Обработано строк'),
+        ),
+        migrations.AddField(
+            model_name='importingredient',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Начало'),
+        ),
+        migrations.AddField(
+            model_name='importingredient',
+            name='status',
+            field=models.CharField(choices=[('pending', 'В очереди'), ('processing', 'Обрабатывается'), ('done', 'Завершён'), ('failed', 'Ошибка')], default='pending', max_length=20, verbose_name='Статус'),
+        ),
+        migrations.RunPython(
+            finish_previous_imports, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 3.2.15 on 2026-10-18 03:40
+
+from django.db import migrations, models
+
+MAX_TAGS = 63
+
+
+def fill_bits_and_masks(apps, schema_editor):
+    Tag = apps.get_model('recipes', 'Tag')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    tags = list(Tag.objects.order_by('id'))
+    if len(tags) > MAX_TAGS:
+        raise RuntimeError(f'Тегов больше {MAX_TAGS}, маска не поместится')
+    for bit, tag in enumerate(tags):
+        tag.bit = bit
+    Tag.objects.bulk_update(tags, ['bit'])
+    masks = {}
+    for recipe_id, bit in Recipe.tags.through.objects.values_list(
+        'recipe_id', 'tag__bit'
+    ):
+        masks[recipe_id] = masks.get(recipe_id, 0) | 1 << bit
+    Recipe.objects.bulk_update(
+        [Recipe(id=pk, tags_mask=mask) for pk, mask in masks.items()],
+        ['tags_mask'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(null=True, editable=False, verbose_name='Бит в маске тегов'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Маска тегов'),
+        ),
+        migrations.RunPython(fill_bits_and_masks, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(editable=False, unique=True, verbose_name='Бит в маске тегов'),
+        ),
+    ]
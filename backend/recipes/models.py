@@ -1,20 +1,63 @@
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
 from django.db.models import UniqueConstraint
 
 User = get_user_model()
 
+MAX_TAGS = 63
+
 
 class ImportIngredient(models.Model):
-    """Модель импорта ингридиентов."""
+    """Модель импорта ингридиентов.
+
+    Запись служит заданием для фоновой загрузки файла и хранит её
+    состояние и счётчики.
+    """
+
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (PROCESSING, 'Обрабатывается'),
+        (DONE, 'Завершён'),
+        (FAILED, 'Ошибка'),
+    )
 
     csv_file = models.FileField(upload_to='uploads/')
     date_added = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(
+        'Статус', max_length=20, choices=STATUSES, default=PENDING
+    )
+    processed = models.PositiveIntegerField('Обработано строк', default=0)
+    created = models.PositiveIntegerField('Добавлено', default=0)
+    duplicates = models.PositiveIntegerField('Дублей', default=0)
+    errors = models.PositiveIntegerField('Ошибок', default=0)
+    message = models.TextField('Сообщение', blank=True)
+    started_at = models.DateTimeField('Начало', null=True, blank=True)
+    finished_at = models.DateTimeField('Окончание', null=True, blank=True)
+
+    class Meta:
+        ordering = ('-date_added',)
+        verbose_name = 'Импорт ингредиентов'
+        verbose_name_plural = 'Импорт ингредиентов'
+
+    def __str__(self):
+        return f'{self.csv_file.name} ({self.get_status_display()})'
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
 
 
 class Tag(models.Model):
-    """Модель Тэг."""
+    """Модель Тэг.
+
+    Каждому тегу выделяется свой бит в Recipe.tags_mask.
+    """
 
     name = models.CharField('Название', unique=True, max_length=200)
     color = models.CharField(
@@ -29,6 +72,9 @@ class Tag(models.Model):
         ],
     )
     slug = models.SlugField('Уникальный слаг', unique=True, max_length=200)
+    bit = models.PositiveSmallIntegerField(
+        'Бит в маске тегов', unique=True, editable=False
+    )
 
     class Meta:
         verbose_name = 'Тег'
@@ -37,6 +83,24 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+    def get_free_bit(self):
+        used = set(
+            Tag.objects.exclude(pk=self.pk).values_list('bit', flat=True)
+        )
+        for bit in range(MAX_TAGS):
+            if bit not in used:
+                return bit
+        raise ValidationError(f'Можно создать не больше {MAX_TAGS} тегов')
+
+    def clean(self):
+        if self.bit is None:
+            self.get_free_bit()
+
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            self.bit = self.get_free_bit()
+        super().save(*args, **kwargs)
+
 
 class Ingredient(models.Model):
     """Модель Ингридиент."""
@@ -48,6 +112,12 @@ class Ingredient(models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ['name']
+        constraints = [
+            UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient',
+            )
+        ]
 
     def __str__(self):
         return f'{self.name}, {self.measurement_unit}'
@@ -65,6 +135,9 @@ class Recipe(models.Model):
     )
     name = models.CharField('Название', max_length=200)
     image = models.ImageField('Изображение', upload_to='recipes/')
+    image_variants = models.JSONField(
+        'Уменьшенные копии изображения', default=dict, editable=False
+    )
     text = models.TextField('Описание')
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -82,11 +155,36 @@ class Recipe(models.Model):
     pub_date = models.DateTimeField(
         auto_now_add=True, verbose_name='Дата публикации'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True, db_index=True, verbose_name='Дата изменения'
+    )
+    tags_mask = models.BigIntegerField(
+        'Маска тегов', default=0, editable=False
+    )
+    favorites_count = models.PositiveIntegerField(
+        'Количество в избранном', default=0, editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Количество в корзинах', default=0, editable=False
+    )
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'], name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['-favorites_count', '-pub_date', '-id'],
+                name='recipe_popularity_idx',
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -179,3 +277,34 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user} добавил "{self.recipe}" в Корзину покупок'
+
+
+class ShoppingCartIngredient(models.Model):
+    """Суммарное количество ингредиента в корзине пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField('Количество')
+
+    class Meta:
+        verbose_name = 'Ингредиент в списке покупок'
+        verbose_name_plural = 'Ингредиенты в списках покупок'
+        constraints = [
+            UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_cart_ingredient',
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user}: {self.ingredient} - {self.amount}'
@@ -0,0 +1,290 @@
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from foodgram.cache import bump_version
+from foodgram.constants import (
+    CART_VERSION,
+    FAVORITES_VERSION,
+    RECIPE_VERSION,
+    RECIPES_POPULARITY,
+)
+
+from .models import (
+    Favourite,
+    IngredientInRecipe,
+    Recipe,
+    ShoppingCart,
+    ShoppingCartIngredient,
+    User,
+)
+
+RECIPE_COUNTERS = {
+    Favourite: 'favorites_count',
+    ShoppingCart: 'in_carts_count',
+}
+
+USER_RECIPES_VERSIONS = {
+    Favourite: FAVORITES_VERSION,
+    ShoppingCart: CART_VERSION,
+}
+
+
+def change_recipe_counters(model, recipe_ids, step):
+    """Изменить счётчик рецептов, соответствующий модели model."""
+    field = RECIPE_COUNTERS[model]
+    if Recipe.objects.filter(id__in=recipe_ids).update(
+        **{field: F(field) + step}
+    ):
+        transaction.on_commit(lambda: bump_version(RECIPES_POPULARITY))
+
+
+@transaction.atomic
+def add_user_recipes(model, user_id, recipe_ids):
+    """Добавить рецепты в избранное или корзину пользователя.
+
+    Изменения одного пользователя упорядочиваются блокировкой его
+    строки, поэтому уже добавленные рецепты отсеиваются точно, а
+    параллельную вставку отбрасывает ignore_conflicts. Возвращает id
+    добавленных рецептов.
+    """
+    User.objects.select_for_update().filter(id=user_id).exists()
+    existing = set(
+        model.objects.filter(
+            user_id=user_id, recipe_id__in=recipe_ids
+        ).values_list('recipe_id', flat=True)
+    )
+    added = [pk for pk in dict.fromkeys(recipe_ids) if pk not in existing]
+    model.objects.bulk_create(
+        [model(user_id=user_id, recipe_id=pk) for pk in added],
+        ignore_conflicts=True,
+    )
+    change_recipe_counters(model, added, 1)
+    if model is ShoppingCart:
+        add_to_shopping_list([user_id], added)
+    if added:
+        transaction.on_commit(lambda: bump_user_recipes(model, [user_id]))
+    return added
+
+
+@transaction.atomic
+def remove_user_recipes(model, user_id, recipe_ids):
+    """Удалить рецепты из избранного или корзины пользователя.
+
+    У моделей нет обработчиков сигналов, поэтому строки удаляются
+    одним DELETE, а версии пользователя обновляются здесь один раз.
+    Возвращает id действительно удалённых рецептов.
+    """
+    User.objects.select_for_update().filter(id=user_id).exists()
+    rows = dict(
+        model.objects.filter(
+            user_id=user_id, recipe_id__in=recipe_ids
+        ).values_list('id', 'recipe_id')
+    )
+    removed = list(rows.values())
+    if not removed:
+        return removed
+    if model is ShoppingCart:
+        remove_from_shopping_list([user_id], removed)
+    model.objects.filter(id__in=rows).delete()
+    change_recipe_counters(model, removed, -1)
+    transaction.on_commit(lambda: bump_user_recipes(model, [user_id]))
+    return removed
+
+
+def update_tags_masks(recipe_ids):
+    """Пересчитать маски тегов рецептов recipe_ids по их тегам."""
+    masks = dict.fromkeys(recipe_ids, 0)
+    for recipe_id, bit in Recipe.tags.through.objects.filter(
+        recipe_id__in=masks
+    ).values_list('recipe_id', 'tag__bit'):
+        masks[recipe_id] |= 1 << bit
+    Recipe.objects.bulk_update(
+        [Recipe(id=pk, tags_mask=mask) for pk, mask in masks.items()],
+        ['tags_mask'],
+    )
+
+
+def filter_by_tags_mask(queryset, mask):
+    """Рецепты, у которых есть хотя бы один тег из маски."""
+    return queryset.alias(tag_bits=F('tags_mask').bitand(mask)).filter(
+        tag_bits__gt=0
+    )
+
+
+def reconcile_recipe_counters():
+    """Пересчитать счётчики избранного и корзин одним запросом."""
+    return Recipe.objects.update(
+        **{
+            field: Coalesce(
+                Subquery(
+                    model.objects.filter(recipe=OuterRef('pk'))
+                    .order_by()
+                    .values('recipe')
+                    .annotate(total=Count('id'))
+                    .values('total')
+                ),
+                0,
+            )
+            for model, field in RECIPE_COUNTERS.items()
+        }
+    )
+
+
+def get_recipe_amounts(recipe_ids):
+    """Суммарные количества ингредиентов рецептов recipe_ids."""
+    amounts = Counter()
+    for ingredient_id, amount in IngredientInRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list('ingredient_id', 'amount'):
+        amounts[ingredient_id] += amount
+    return amounts
+
+
+def bump_user_recipes(model, user_ids):
+    """Сменить версии избранного или корзины пользователей."""
+    for user_id in user_ids:
+        bump_version(USER_RECIPES_VERSIONS[model].format(user_id))
+
+
+def bump_carts(user_ids):
+    bump_user_recipes(ShoppingCart, user_ids)
+
+
+@transaction.atomic
+def apply_shopping_list_delta(user_ids, delta):
+    """Изменить суммы ингредиентов в списках покупок пользователей.
+
+    delta сопоставляет id ингредиента и прибавляемое количество;
+    строки, сумма в которых стала нулевой, удаляются.
+    """
+    delta = {key: value for key, value in delta.items() if value}
+    if not user_ids or not delta:
+        return
+    existing = {
+        (item.user_id, item.ingredient_id): item
+        for item in ShoppingCartIngredient.objects.select_for_update().filter(
+            user_id__in=user_ids, ingredient_id__in=delta
+        )
+    }
+    created, updated, deleted = [], [], []
+    for user_id in user_ids:
+        for ingredient_id, amount in delta.items():
+            item = existing.get((user_id, ingredient_id))
+            if item is None:
+                if amount > 0:
+                    created.append(
+                        ShoppingCartIngredient(
+                            user_id=user_id,
+                            ingredient_id=ingredient_id,
+                            amount=amount,
+                        )
+                    )
+                continue
+            item.amount += amount
+            if item.amount > 0:
+                updated.append(item)
+            else:
+                deleted.append(item.id)
+    ShoppingCartIngredient.objects.bulk_create(created)
+    ShoppingCartIngredient.objects.bulk_update(updated, ['amount'])
+    ShoppingCartIngredient.objects.filter(id__in=deleted).delete()
+    transaction.on_commit(lambda: bump_carts(user_ids))
+
+
+def add_to_shopping_list(user_ids, recipe_ids):
+    """Учесть рецепты, добавленные в корзины пользователей."""
+    apply_shopping_list_delta(user_ids, get_recipe_amounts(recipe_ids))
+
+
+def remove_from_shopping_list(user_ids, recipe_ids):
+    """Учесть рецепты, удалённые из корзин пользователей."""
+    amounts = get_recipe_amounts(recipe_ids)
+    apply_shopping_list_delta(
+        user_ids, {key: -value for key, value in amounts.items()}
+    )
+
+
+def update_shopping_lists(recipe, old_amounts, new_amounts):
+    """Перенести изменение состава рецепта в списки покупок."""
+    delta = Counter(new_amounts)
+    delta.subtract(old_amounts)
+    if not any(delta.values()):
+        return
+    apply_shopping_list_delta(
+        list(
+            ShoppingCart.objects.filter(recipe=recipe).values_list(
+                'user_id', flat=True
+            )
+        ),
+        delta,
+    )
+
+
+@transaction.atomic
+def update_recipe_ingredients(recipe, amounts, items=None):
+    """Привести состав рецепта к amounts изменением только отличий.
+
+    amounts сопоставляет id ингредиента и количество. Новые строки
+    вставляются, изменённые количества обновляются одним bulk_update,
+    лишние строки удаляются; разница переносится в списки покупок.
+    Текущие строки можно передать в items, если они уже загружены.
+    Возвращает строки нового состава рецепта и признак изменения.
+    """
+    if items is None:
+        items = IngredientInRecipe.objects.filter(recipe=recipe)
+    current = {item.ingredient_id: item for item in items}
+    old_amounts = {key: item.amount for key, item in current.items()}
+    created, updated = [], []
+    for ingredient_id, amount in amounts.items():
+        item = current.get(ingredient_id)
+        if item is None:
+            created.append(
+                IngredientInRecipe(
+                    recipe=recipe, ingredient_id=ingredient_id, amount=amount
+                )
+            )
+        elif item.amount != amount:
+            item.amount = amount
+            updated.append(item)
+    deleted = [item.id for key, item in current.items() if key not in amounts]
+    if created:
+        IngredientInRecipe.objects.bulk_create(created)
+    if updated:
+        IngredientInRecipe.objects.bulk_update(updated, ['amount'])
+    if deleted:
+        IngredientInRecipe.objects.filter(id__in=deleted).delete()
+    update_shopping_lists(recipe, old_amounts, amounts)
+    changed = bool(created or updated or deleted)
+    if changed:
+        transaction.on_commit(
+            lambda: bump_version(RECIPE_VERSION.format(recipe.id))
+        )
+    items = [item for key, item in current.items() if key in amounts]
+    return items + created, changed
+
+
+@transaction.atomic
+def rebuild_shopping_lists(batch_size=1000):
+    """Пересчитать списки покупок всех пользователей по их корзинам."""
+    ShoppingCartIngredient.objects.all().delete()
+    ShoppingCartIngredient.objects.bulk_create(
+        (
+            ShoppingCartIngredient(
+                user_id=row['recipe__shopping_cart__user'],
+                ingredient_id=row['ingredient'],
+                amount=row['amount'],
+            )
+            for row in IngredientInRecipe.objects.filter(
+                recipe__shopping_cart__isnull=False
+            )
+            .values('recipe__shopping_cart__user', 'ingredient')
+            .annotate(amount=Sum('amount'))
+            .order_by()
+            .iterator(chunk_size=batch_size)
+        ),
+        batch_size=batch_size,
+    )
+    return ShoppingCartIngredient.objects.count()
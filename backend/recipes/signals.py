@@ -0,0 +1,127 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+
+from foodgram.cache import bump_versions
+from foodgram.constants import (
+    AUTHOR_VERSION,
+    AUTHORS,
+    INGREDIENT_VERSION,
+    INGREDIENTS_CATALOG,
+    RECIPE_VERSION,
+    RECIPES_LIST,
+    TAG_VERSION,
+    TAGS_CATALOG,
+)
+
+from .images import has_actual_variants, schedule_image
+from .models import Ingredient, Recipe, ShoppingCart, Tag, User
+from .services import (
+    RECIPE_COUNTERS,
+    bump_user_recipes,
+    change_recipe_counters,
+    filter_by_tags_mask,
+    remove_from_shopping_list,
+    update_tags_masks,
+)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tags_changed(instance, **kwargs):
+    names = (TAGS_CATALOG, TAG_VERSION.format(instance.id), RECIPES_LIST)
+    transaction.on_commit(lambda: bump_versions(names))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredients_changed(instance, **kwargs):
+    names = (INGREDIENTS_CATALOG, INGREDIENT_VERSION.format(instance.id))
+    transaction.on_commit(lambda: bump_versions(names))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(signal, instance, created=False, **kwargs):
+    names = [RECIPE_VERSION.format(instance.id)]
+    if created or signal is post_delete:
+        names.append(RECIPES_LIST)
+    transaction.on_commit(lambda: bump_versions(names))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_changed(instance, **kwargs):
+    if instance.image and not has_actual_variants(instance):
+        schedule_image(instance)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        recipe_ids = [instance.id]
+    elif pk_set is None:
+        recipe_ids = list(
+            filter_by_tags_mask(
+                Recipe.objects.all(), 1 << instance.bit
+            ).values_list('id', flat=True)
+        )
+    else:
+        recipe_ids = list(pk_set)
+    update_tags_masks(recipe_ids)
+    names = [RECIPE_VERSION.format(pk) for pk in recipe_ids]
+    names.append(RECIPES_LIST)
+    transaction.on_commit(lambda: bump_versions(names))
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(instance, **kwargs):
+    filter_by_tags_mask(Recipe.objects.all(), 1 << instance.bit).update(
+        tags_mask=F('tags_mask') - (1 << instance.bit)
+    )
+
+
+@receiver(post_save, sender=User)
+def author_changed(instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    names = (AUTHOR_VERSION.format(instance.id), AUTHORS)
+    transaction.on_commit(lambda: bump_versions(names))
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    """Учесть избранное и корзины, удаляемые вместе с рецептом.
+
+    У Favourite и ShoppingCart нет обработчиков сигналов, чтобы их
+    строки удалялись одним DELETE, поэтому списки покупок и версии
+    пользователей обновляются здесь.
+    """
+    users = {
+        model: list(
+            model.objects.filter(recipe=instance).values_list(
+                'user_id', flat=True
+            )
+        )
+        for model in RECIPE_COUNTERS
+    }
+    if users[ShoppingCart]:
+        remove_from_shopping_list(users[ShoppingCart], [instance.id])
+
+    def bump():
+        for model, user_ids in users.items():
+            bump_user_recipes(model, user_ids)
+
+    transaction.on_commit(bump)
+
+
+@receiver(pre_delete, sender=User)
+def user_deleted(instance, **kwargs):
+    for model in RECIPE_COUNTERS:
+        change_recipe_counters(
+            model, model.objects.filter(user=instance).values('recipe'), -1
+        )
@@ -0,0 +1,142 @@
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from recipes.models import (
+    Favourite,
+    IngredientInRecipe,
+    ShoppingCart,
+    ShoppingCartIngredient,
+)
+from recipes.services import add_user_recipes, get_recipe_amounts
+
+
+@pytest.fixture
+def admin_client(make_user):
+    admin = make_user('admin')
+    admin.is_staff = admin.is_superuser = True
+    admin.save()
+    client = Client()
+    client.force_login(admin)
+    return client
+
+
+def get_totals(user):
+    return dict(
+        ShoppingCartIngredient.objects.filter(user=user).values_list(
+            'ingredient_id', 'amount'
+        )
+    )
+
+
+def test_recipe_inline_updates_shopping_lists(
+    admin_client, user, make_user, make_recipe, tags, ingredients
+):
+    flour, sugar, salt, _ = ingredients
+    recipe = make_recipe(
+        make_user('author'), amounts={flour.id: 100, sugar.id: 50}
+    )
+    add_user_recipes(ShoppingCart, user.id, [recipe.id])
+    items = {
+        item.ingredient_id: item
+        for item in IngredientInRecipe.objects.filter(recipe=recipe)
+    }
+    prefix = 'ingredient_list'
+    data = {
+        'author': recipe.author_id,
+        'name': recipe.name,
+        'text': recipe.text,
+        'tags': [tag.id for tag in tags],
+        'cooking_time': recipe.cooking_time,
+        f'{prefix}-TOTAL_FORMS': 3,
+        f'{prefix}-INITIAL_FORMS': 2,
+        f'{prefix}-MIN_NUM_FORMS': 1,
+        f'{prefix}-MAX_NUM_FORMS': 1000,
+        f'{prefix}-0-id': items[flour.id].id,
+        f'{prefix}-0-recipe': recipe.id,
+        f'{prefix}-0-ingredient': flour.id,
+        f'{prefix}-0-amount': 150,
+        f'{prefix}-1-id': items[sugar.id].id,
+        f'{prefix}-1-recipe': recipe.id,
+        f'{prefix}-1-ingredient': sugar.id,
+        f'{prefix}-1-amount': 50,
+        f'{prefix}-1-DELETE': 'on',
+        f'{prefix}-2-recipe': recipe.id,
+        f'{prefix}-2-ingredient': salt.id,
+        f'{prefix}-2-amount': 5,
+    }
+    response = admin_client.post(
+        f'/admin/recipes/recipe/{recipe.id}/change/', data
+    )
+    assert response.status_code == 302, response.content
+    assert get_recipe_amounts([recipe.id]) == {flour.id: 150, salt.id: 5}
+    assert get_totals(user) == {flour.id: 150, salt.id: 5}
+
+
+def test_favourite_admin_keeps_counter(admin_client, user, make_recipe):
+    recipe = make_recipe(user)
+    response = admin_client.post(
+        '/admin/recipes/favourite/add/',
+        {'user': user.id, 'recipe': recipe.id},
+    )
+    assert response.status_code == 302, response.content
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == 1
+    favourite = Favourite.objects.get(user=user, recipe=recipe)
+    response = admin_client.post(
+        f'/admin/recipes/favourite/{favourite.id}/delete/', {'post': 'yes'}
+    )
+    assert response.status_code == 302, response.content
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == 0
+
+
+def test_shopping_cart_admin_uses_services(
+    admin_client, user, make_recipe, ingredients
+):
+    recipe = make_recipe(user)
+    response = admin_client.post(
+        '/admin/recipes/shoppingcart/add/',
+        {'user': user.id, 'recipe': recipe.id},
+    )
+    assert response.status_code == 302, response.content
+    recipe.refresh_from_db()
+    assert recipe.in_carts_count == 1
+    assert get_totals(user) == get_recipe_amounts([recipe.id])
+
+    cart = ShoppingCart.objects.get(user=user, recipe=recipe)
+    response = admin_client.post(
+        '/admin/recipes/shoppingcart/',
+        {
+            'action': 'delete_selected',
+            '_selected_action': [cart.id],
+            'post': 'yes',
+        },
+    )
+    assert response.status_code == 302, response.content
+    assert not ShoppingCart.objects.exists()
+    recipe.refresh_from_db()
+    assert recipe.in_carts_count == 0
+    assert get_totals(user) == {}
+
+
+def test_recipe_ingredient_admin_is_read_only(admin_client):
+    response = admin_client.get('/admin/recipes/ingredientinrecipe/add/')
+    assert response.status_code == 403
+
+
+def test_recipe_delete_queries_do_not_depend_on_carts(
+    make_user, make_recipe
+):
+    author = make_user('author')
+    costs = []
+    for count in (2, 20):
+        recipe = make_recipe(author)
+        for number in range(count):
+            user = make_user(f'user{count}-{number}')
+            add_user_recipes(ShoppingCart, user.id, [recipe.id])
+        with CaptureQueriesContext(connection) as context:
+            recipe.delete()
+        costs.append(len(context.captured_queries))
+    assert costs[0] == costs[1]
@@ -0,0 +1,57 @@
+import os
+import time
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.utils import timezone
+
+from recipes.management.commands import collect_media
+from recipes.models import Recipe
+
+HOUR_AGO = time.time() - 60 * 60
+
+
+def save_old(content, name='recipes/image.png'):
+    name = default_storage.save(name, ContentFile(content))
+    os.utime(default_storage.path(name), (HOUR_AGO, HOUR_AGO))
+    return name
+
+
+def test_dedup_hit_refreshes_modified_time(settings):
+    name = save_old(b'image')
+    assert default_storage.save('recipes/copy.png', ContentFile(b'image')) == (
+        name
+    )
+    assert os.path.getmtime(default_storage.path(name)) > HOUR_AGO + 60
+
+
+def test_collect_media_keeps_files_referenced_during_scan(
+    monkeypatch, user, make_recipe
+):
+    orphan = save_old(b'orphan')
+    used = save_old(b'used')
+    variant = save_old(b'variant', 'recipes/variants/image-100.webp')
+    recipe = make_recipe(user)
+
+    def get_referenced_files():
+        # Ссылки появляются сразу после того, как команда собрала список.
+        Recipe.objects.filter(pk=recipe.pk).update(
+            image=used,
+            image_variants={
+                'source': used,
+                'variants': [
+                    {'width': 100, 'format': 'webp', 'name': variant}
+                ],
+            },
+            updated_at=timezone.now(),
+        )
+        return set()
+
+    monkeypatch.setattr(
+        collect_media, 'get_referenced_files', get_referenced_files
+    )
+    call_command('collect_media', min_age=60, stdout=open(os.devnull, 'w'))
+    assert not default_storage.exists(orphan)
+    assert default_storage.exists(used)
+    assert default_storage.exists(variant)
@@ -0,0 +1,73 @@
+import pytest
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+BEFORE = [('recipes', '0006_recipe_counters')]
+AFTER = [('recipes', '0007_unique_ingredient')]
+
+
+def migrate(targets):
+    executor = MigrationExecutor(connection)
+    executor.migrate(targets)
+    return executor.loader.project_state(targets).apps
+
+
+@pytest.fixture
+def migrator(transactional_db):
+    yield migrate
+    migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+
+def test_unique_ingredient_merges_duplicates(migrator):
+    apps = migrator(BEFORE)
+    User = apps.get_model('users', 'User')
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    ShoppingCartIngredient = apps.get_model(
+        'recipes', 'ShoppingCartIngredient'
+    )
+    author = User.objects.create(username='author', email='a@example.com')
+    kept, first, second = (
+        Ingredient.objects.create(name='соль', measurement_unit='г')
+        for _ in range(3)
+    )
+    both, single = (
+        Recipe.objects.create(
+            author=author,
+            name=name,
+            image='recipes/image.png',
+            text='Текст',
+            cooking_time=1,
+        )
+        for name in ('Оба', 'Один')
+    )
+    IngredientInRecipe.objects.bulk_create(
+        [
+            IngredientInRecipe(recipe=both, ingredient=kept, amount=1),
+            IngredientInRecipe(recipe=both, ingredient=first, amount=2),
+            IngredientInRecipe(recipe=both, ingredient=second, amount=4),
+            IngredientInRecipe(recipe=single, ingredient=second, amount=8),
+        ]
+    )
+    ShoppingCartIngredient.objects.create(
+        user=author, ingredient=first, amount=3
+    )
+
+    apps = migrator(AFTER)
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientInRecipe = apps.get_model('recipes', 'IngredientInRecipe')
+    ShoppingCartIngredient = apps.get_model(
+        'recipes', 'ShoppingCartIngredient'
+    )
+    assert list(Ingredient.objects.values_list('id', flat=True)) == [
+        kept.id
+    ]
+    assert sorted(
+        IngredientInRecipe.objects.values_list(
+            'recipe_id', 'ingredient_id', 'amount'
+        )
+    ) == sorted([(both.id, kept.id, 7), (single.id, kept.id, 8)])
+    assert list(
+        ShoppingCartIngredient.objects.values_list('ingredient_id', 'amount')
+    ) == [(kept.id, 3)]
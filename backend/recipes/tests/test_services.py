@@ -0,0 +1,61 @@
+import pytest
+from django.db import connection
+from django.db.models.deletion import Collector
+from django.test.utils import CaptureQueriesContext
+
+from foodgram.cache import get_version
+from recipes.models import Favourite, Recipe, ShoppingCart
+from recipes.services import (
+    RECIPE_COUNTERS,
+    USER_RECIPES_VERSIONS,
+    add_user_recipes,
+    remove_user_recipes,
+)
+
+
+@pytest.mark.parametrize('model', (Favourite, ShoppingCart))
+def test_remove_user_recipes_queries_do_not_depend_on_count(
+    model, user, make_recipe, django_capture_on_commit_callbacks
+):
+    recipes = [make_recipe(user, name=f'Рецепт {n}') for n in range(4)]
+    ids = [recipe.id for recipe in recipes]
+    add_user_recipes(model, user.id, ids)
+    name = USER_RECIPES_VERSIONS[model].format(user.id)
+    version = get_version(name)
+    costs = []
+    for removed in (ids[:1], ids[1:]):
+        with django_capture_on_commit_callbacks(
+            execute=True
+        ) as callbacks, CaptureQueriesContext(connection) as context:
+            assert remove_user_recipes(model, user.id, removed) == removed
+        costs.append((len(context.captured_queries), len(callbacks)))
+    assert costs[0] == costs[1]
+    assert not model.objects.filter(user=user).exists()
+    assert set(
+        Recipe.objects.values_list(RECIPE_COUNTERS[model], flat=True)
+    ) == {0}
+    assert get_version(name) != version
+
+
+def test_remove_user_recipes_ignores_missing(user, make_recipe):
+    recipe = make_recipe(user)
+    assert remove_user_recipes(Favourite, user.id, [recipe.id]) == []
+
+
+@pytest.mark.parametrize('model', (Favourite, ShoppingCart))
+def test_user_recipes_are_fast_deleted(model):
+    assert Collector(connection.alias).can_fast_delete(model.objects.all())
+
+
+@pytest.mark.parametrize('model', (Favourite, ShoppingCart))
+def test_recipe_delete_bumps_user_versions(
+    model, user, make_recipe, django_capture_on_commit_callbacks
+):
+    recipe = make_recipe(user)
+    add_user_recipes(model, user.id, [recipe.id])
+    name = USER_RECIPES_VERSIONS[model].format(user.id)
+    version = get_version(name)
+    with django_capture_on_commit_callbacks(execute=True):
+        recipe.delete()
+    assert not model.objects.exists()
+    assert get_version(name) != version
@@ -0,0 +1,74 @@
+import pytest
+
+from recipes.models import Recipe, Tag
+from recipes.services import filter_by_tags_mask
+
+
+def get_mask(recipe):
+    recipe.refresh_from_db(fields=['tags_mask'])
+    return recipe.tags_mask
+
+
+def bits(*tags):
+    return sum(1 << tag.bit for tag in tags)
+
+
+def test_mask_follows_recipe_tags(user, make_recipe, tags):
+    first, second, third = tags
+    recipe = make_recipe(user, recipe_tags=[first])
+    assert get_mask(recipe) == bits(first)
+    recipe.tags.add(third)
+    assert get_mask(recipe) == bits(first, third)
+    recipe.tags.set([second, third])
+    assert get_mask(recipe) == bits(second, third)
+    recipe.tags.remove(third)
+    assert get_mask(recipe) == bits(second)
+    recipe.tags.clear()
+    assert get_mask(recipe) == 0
+
+
+def test_mask_follows_tag_recipes(user, make_recipe, tags):
+    first, second, _ = tags
+    one = make_recipe(user, recipe_tags=[first])
+    two = make_recipe(user, recipe_tags=[first])
+    second.recipes.add(one, two)
+    assert get_mask(one) == get_mask(two) == bits(first, second)
+    second.recipes.remove(two)
+    assert get_mask(two) == bits(first)
+    first.recipes.clear()
+    assert get_mask(one) == bits(second)
+    assert get_mask(two) == 0
+
+
+def test_deleted_tag_bit_is_cleared_and_reused(user, make_recipe, tags):
+    first, second, _ = tags
+    recipe = make_recipe(user, recipe_tags=[first, second])
+    bit = second.bit
+    second.delete()
+    assert get_mask(recipe) == bits(first)
+    new = Tag.objects.create(name='Новый', color='#111111', slug='new')
+    assert new.bit == bit
+    assert not filter_by_tags_mask(Recipe.objects.all(), bits(new)).exists()
+
+
+@pytest.mark.parametrize(
+    'slugs, expected',
+    (
+        (['tag0'], {'Первый', 'Оба'}),
+        (['tag1', 'tag2'], {'Второй', 'Оба'}),
+        (['tag2'], set()),
+    ),
+)
+def test_filter_by_tags(
+    slugs, expected, anonymous_client, user, make_recipe, tags
+):
+    make_recipe(user, name='Первый', recipe_tags=[tags[0]])
+    make_recipe(user, name='Второй', recipe_tags=[tags[1]])
+    make_recipe(user, name='Оба', recipe_tags=tags[:2])
+    make_recipe(user, name='Без тегов', recipe_tags=[])
+    response = anonymous_client.get(
+        '/api/recipes/', {'tags': slugs, 'limit': 10}
+    )
+    assert response.status_code == 200, response.content
+    names = {recipe['name'] for recipe in response.json()['results']}
+    assert names == expected
@@ -1,3 +1,3 @@
 EMAIL_MAX_LEN = 254
 CHARS_MAX_LEN = 150
-LIMIT_RECIPE = 'recipes_limit должен быть целым числом'
+LIMIT_RECIPE = 'recipes_limit должен быть неотрицательным целым числом'
@@ -0,0 +1,15 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from foodgram.cache import bump_version
+from foodgram.constants import SUBSCRIPTIONS_VERSION
+
+from .models import Subscription
+
+
+@receiver((post_save, post_delete), sender=Subscription)
+def subscriptions_changed(instance, **kwargs):
+    transaction.on_commit(
+        lambda: bump_version(SUBSCRIPTIONS_VERSION.format(instance.user_id))
+    )